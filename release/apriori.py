@@ -1,4 +1,23 @@
+import os
+from array import array
+from binascii import hexlify
 from collections import defaultdict
+from heapq import heappush, heappop, heapreplace, heapify
+from vectorized import NumpyCounter
+from itemstore import ItemsetTrie
+from checkpoint import dataset_fingerprint, save_checkpoint, load_checkpoint
+
+# fan-out of the interior nodes and capacity of the leaves of hash trees
+HASH_BRANCHES = 64
+HASH_LEAF_SIZE = 16
+
+# maximum estimated size of C^k, in number of itemset IDs, for the 
+# AprioriHybrid algorithm to switch to AprioriTid
+HYBRID_BUDGET = 1 << 24
+
+# multiplier of the hash function of item pairs (a, b) of the DHP algorithm, 
+# which is (a * DHP_MULTIPLIER + b) modulo the number of buckets
+DHP_MULTIPLIER = 1000003
 
 """count the number of occurrences (support) of given itemset
 
@@ -8,20 +27,22 @@ candidate : list[int]
     candidate itemset
 data : list[set(int)]
     list of transactions
+weights : list[int], optional
+    number of occurrences of each transaction, 1 each if not given
 
 Returns
 -------
 int
 """
-def count_occurences(candidate, data):
+def count_occurences(candidate, data, weights=None):
     if not candidate: return 0
     candidate, l = set(candidate), len(candidate)
     count = 0
-    for transaction in data:
+    for tid, transaction in enumerate(data):
         if len(candidate - transaction) == 0:
             # number of items that are in the candidate itemset but missing 
             # in the transaction is 0 => the transaction "support" this itemset
-            count += 1
+            count += 1 if weights is None else weights[tid]
     return count
 
 """prune unlikely itemset
@@ -33,20 +54,597 @@ Parameters
 ----------
 candidate : list[int]
     candidate itemset
-itemsets : dict{tuple(int):float}
+itemsets : dict{tuple(int):float} or ItemsetTrie
     known large itemsets
+required : set(int), optional
+    items leading every itemset kept, see itemsets_apriori(); the subset 
+    without the first item is not checked unless it starts with one of them
 
 Returns
 -------
 boolean
     True if pruned; False if not pruned
 """
-def subset_pruned(candidate, itemsets):
+def subset_pruned(candidate, itemsets, required=None):
+    if required is not None and candidate[1] not in required:
+        # the subset without the first item is not recorded
+        return any(tuple(candidate[:i] + candidate[i+1:]) not in itemsets
+                   for i in xrange(1, len(candidate)))
+    if isinstance(itemsets, ItemsetTrie):
+        # look up the subsets in place, without building them
+        return not itemsets.contains_subsets(candidate)
     for i in xrange(len(candidate)):
         if not tuple(candidate[:i] + candidate[i+1:]) in itemsets:
             return True
     return False
 
+"""build the support threshold test shared by the miners: an itemset is 
+large if its support value float(count) / total is at least min_supp
+
+Parameters
+----------
+total : int
+    total number of transactions, used for computing support values
+min_supp: float
+    minimum support value for an itemset to be "large"
+
+Returns
+-------
+function(int) -> boolean
+    True if an itemset of the given number of occurrences is large
+"""
+def large_test(total, min_supp):
+    return lambda count: float(count) / total >= min_supp
+
+"""record a large itemset and its support value into the final results
+
+Parameters
+----------
+itemsets : dict{tuple(int):float} or ItemsetTrie
+    large itemsets and their support values, an ItemsetTrie keeps the 
+    count instead
+itemset : list[int]
+    the large itemset
+count : int
+    number of occurrences of itemset
+total : int
+    total number of transactions, used for computing support values
+"""
+def record_itemset(itemsets, itemset, count, total):
+    if isinstance(itemsets, ItemsetTrie):
+        itemsets.add(itemset, count)
+    else:
+        itemsets[tuple(itemset)] = float(count) / total
+
+"""build a transaction-ID bitmap for every item in the data
+Bit t of the bitmap of an item is set if transaction t contains the item, 
+so the support of an itemset is the popcount of the AND of its bitmaps
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+
+Returns
+-------
+dict{int:long}
+    key-value pairs of items and their transaction-ID bitmaps
+"""
+def build_tid_bitsets(data):
+    data = list(data)
+    size = (len(data) + 7) // 8
+    buffers = {}
+    for tid, trans in enumerate(data):
+        # bytes are filled from the end, so that the buffer reads as a 
+        # big-endian number where byte (tid / 8) holds bits tid & ~7 to tid | 7
+        pos, bit = size - 1 - (tid >> 3), 1 << (tid & 7)
+        for item in trans:
+            buf = buffers.get(item)
+            if buf is None:
+                buf = buffers[item] = bytearray(size)
+            buf[pos] |= bit
+    return dict((item, long(hexlify(buf), 16)) for item, buf in buffers.items())
+
+"""count the number of bits set in a transaction-ID bitmap
+
+Parameters
+----------
+bits : long
+    transaction-ID bitmap
+
+Returns
+-------
+int
+"""
+def popcount(bits):
+    return bin(bits).count('1')
+
+"""split the weights of the transactions into bit planes, so that the 
+weighted count of a transaction-ID bitmap is the sum of the popcounts of 
+its AND with each plane, shifted by the bit of the plane
+
+Parameters
+----------
+weights : list[int]
+    number of occurrences of each transaction, or None
+
+Returns
+-------
+dict{int:long}
+    key-value pairs of bits b and the bitmap of the transactions whose 
+    weight has bit b set, None if weights is None
+"""
+def weight_planes(weights):
+    if weights is None:
+        return None
+    return build_tid_bitsets(
+        [set(b for b in xrange(w.bit_length()) if w >> b & 1) for w in weights])
+
+"""count the transactions of a transaction-ID bitmap, with their weights
+
+Parameters
+----------
+bits : long
+    transaction-ID bitmap
+planes : dict{int:long}
+    bit planes of the weights, see weight_planes(), None for weights of 1
+
+Returns
+-------
+int
+"""
+def weighted_popcount(bits, planes):
+    if planes is None:
+        return popcount(bits)
+    return sum(popcount(bits & plane) << b for b, plane in planes.items())
+
+class ScanCounter(object):
+    """
+    Counting backend that scans all transactions for every candidate, as 
+    described in 2.1 of Rakesh's paper.
+
+    ...
+
+    Methods
+    -------
+    count(candidates)
+        number of occurrences of each candidate itemset
+    update(kplus)
+        notify the backend of the large itemsets found in the current level
+    """
+    def __init__(self, data, weights=None):
+        self.data = data
+        self.weights = weights
+
+    def count(self, candidates):
+        return [count_occurences(candidate, self.data, self.weights) for candidate in candidates]
+
+    def update(self, kplus):
+        pass
+
+class BitsetCounter(object):
+    """
+    Counting backend using vertical transaction-ID bitmaps. The bitmaps of 
+    all items are built from data; the bitmap of a large k-itemset is kept for 
+    the next level, so a (k+1)-candidate costs one AND of its parent (the 
+    candidate without its last item) and the bitmap of its last item. The 
+    bitmaps of the candidates are dropped once counted, and the ones of the 
+    large itemsets are ANDed again in update(): a bitmap takes len(data)/8 
+    bytes however few transactions it holds, and most candidates are not 
+    large. Setting data to a trimmed copy (see trim_transactions()) which 
+    has fewer transactions rebuilds the bitmaps on its transaction IDs, 
+    shorter ones; the items trimmed are in no candidate any more, so the 
+    bitmaps are kept while only items are removed. Weighted transactions are counted with the bit planes of 
+    their weights, see weight_planes().
+
+    ...
+
+    Methods
+    -------
+    count(candidates)
+        number of occurrences of each candidate itemset
+    update(kplus)
+        keep the bitmaps of the large itemsets as parents of the next level
+    """
+    def __init__(self, data, weights=None):
+        self.__parents = {}
+        self.__data = self.__weights = self.__planes = None
+        self.data = data
+        self.weights = weights
+
+    @property
+    def data(self):
+        return self.__data
+
+    @data.setter
+    def data(self, data):
+        unchanged = self.__data is not None and len(data) == len(self.__data)
+        self.__data = data
+        if unchanged:
+            return
+        self.__items = build_tid_bitsets(data)
+        self.__all = (1 << len(data)) - 1
+        # the bitmaps of the parents are ANDed again on the new transaction IDs
+        parents, self.__parents = self.__parents, {}
+        self.__parents = dict((key, self.__bitmap(key)) for key in parents)
+
+    @property
+    def weights(self):
+        return self.__weights
+
+    @weights.setter
+    def weights(self, weights):
+        if (weights is None) != (self.__weights is None) or (
+                weights is not None and len(weights) != len(self.__weights)):
+            self.__planes = weight_planes(weights)
+        self.__weights = weights
+
+    def __bitmap(self, itemset):
+        bits = self.__parents.get(tuple(itemset))
+        if bits is None:
+            # e.g. level 2 candidates have single-item parents
+            bits = self.__all
+            for item in itemset:
+                bits &= self.__items.get(item, 0)
+        return bits
+
+    def count(self, candidates):
+        return [weighted_popcount(self.__bitmap(candidate[:-1]) & 
+                                  self.__items.get(candidate[-1], 0), self.__planes)
+                for candidate in candidates]
+
+    def update(self, kplus):
+        # the parents of the large itemsets are still those of this level
+        self.__parents = dict(
+            (tuple(c), self.__bitmap(c[:-1]) & self.__items.get(c[-1], 0))
+            for family in kplus for c in family)
+
+"""build a hash tree holding candidate itemsets of the same size
+Reference: 2.1.2 of Rakesh's paper - "subset function"
+An interior node at depth d is a dict mapping the hash value of the d-th 
+item of a candidate to a child node; a leaf is a list of candidate indices. 
+A leaf is turned into an interior node once it holds more than leaf_size 
+candidates, unless all the items of its candidates are already hashed.
+
+Parameters
+----------
+candidates : list[list[int]]
+    candidate itemsets, all of the same size
+branches : int
+    number of hash values of an interior node
+leaf_size : int
+    maximum number of candidates of a leaf before it is split
+
+Returns
+-------
+dict or list
+    the root node
+"""
+def build_hash_tree(candidates, branches, leaf_size):
+    root = []
+    for ci, candidate in enumerate(candidates):
+        parent, key, node, depth = None, None, root, 0
+        while isinstance(node, dict):
+            parent, key = node, candidate[depth] % branches
+            node = node.setdefault(key, [])
+            depth += 1
+        node.append(ci)
+        if len(node) > leaf_size and depth < len(candidate):
+            # split the leaf by hashing the next item of its candidates
+            split = {}
+            for cj in node:
+                split.setdefault(candidates[cj][depth] % branches, []).append(cj)
+            if parent is None:
+                root = split
+            else:
+                parent[key] = split
+    return root
+
+class HashTreeCounter(object):
+    """
+    Counting backend of 2.1.2 of Rakesh's paper: all candidates of a level 
+    are stored in a hash tree, then data is scanned once and each 
+    transaction increments the count of every candidate it contains.
+
+    ...
+
+    Attributes
+    ----------
+    record : boolean
+        if True, count() also keeps in contained the indices of the 
+        candidates contained in each transaction (see HybridCounter)
+    contained : list[tuple(int, list[int])]
+        weight and indices of the candidates contained in each transaction, 
+        transactions containing none of them are left out
+
+    Methods
+    -------
+    count(candidates)
+        number of occurrences of each candidate itemset
+    update(kplus)
+        notify the backend of the large itemsets found in the current level
+    """
+    def __init__(self, data, branches=HASH_BRANCHES, leaf_size=HASH_LEAF_SIZE, weights=None):
+        self.data = data
+        self.weights = weights
+        self.branches = branches
+        self.leaf_size = leaf_size
+        self.record = False
+        self.contained = []
+
+    def count(self, candidates):
+        self.contained = []
+        if not candidates:
+            return []
+        k = len(candidates[0])
+        branches = self.branches
+        tree = build_hash_tree(candidates, branches, self.leaf_size)
+        members = [set(candidate) for candidate in candidates]
+        # items of no candidate do not need to be hashed
+        useful = set().union(*members)
+        counts = [0] * len(candidates)
+        # a transaction can reach a leaf more than once through different 
+        # items of the same hash value, last[ci] avoids counting it twice
+        last = [-1] * len(candidates)
+        found = []
+        weights = self.weights
+
+        def visit(node, items, trans, start, depth, tid):
+            if isinstance(node, list):
+                for ci in node:
+                    if last[ci] != tid and members[ci] <= trans:
+                        last[ci] = tid
+                        counts[ci] += 1 if weights is None else weights[tid]
+                        found.append(ci)
+                return
+            # leave enough items after the hashed one to fill a candidate
+            for j in xrange(start, len(items) - k + depth + 1):
+                child = node.get(items[j] % branches)
+                if child is not None:
+                    visit(child, items, trans, j + 1, depth + 1, tid)
+
+        for tid, trans in enumerate(self.data):
+            trans = trans & useful
+            if len(trans) >= k:
+                visit(tree, sorted(trans), trans, 0, 0, tid)
+                if found:
+                    if self.record:
+                        self.contained.append((1 if weights is None else weights[tid], found))
+                    found = []
+        return counts
+
+    def update(self, kplus):
+        pass
+
+class TidCounter(object):
+    """
+    Counting backend of the AprioriTid algorithm, 2.2 of Rakesh's paper. 
+    Instead of the transactions, it scans the encoded set C^k: for each 
+    transaction, the IDs of the large k-itemsets it contains. A transaction 
+    contains a (k+1)-candidate if it contains both of the k-itemsets that 
+    generated the candidate (the candidate without its last item, and the 
+    candidate without its second last item). C^k is rebuilt from the 
+    candidates found at every level, transactions left with fewer than 2 
+    large itemsets cannot contain any candidate and are dropped, so late 
+    levels only touch the few transactions that still matter.
+
+    ...
+
+    Attributes
+    ----------
+    entries : list[tuple(int, set(int))]
+        the encoded C^k, with the weight of each transaction, None before 
+        the first level counted, in which case data (and weights) is used 
+        as C^1 with items as IDs
+    ids : dict{tuple(int):int}
+        IDs of the large k-itemsets
+
+    Methods
+    -------
+    count(candidates)
+        number of occurrences of each candidate itemset
+    seed(candidates, contained)
+        set the candidates contained in each transaction as counted by 
+        another backend, instead of counting them
+    update(kplus)
+        build the encoded C^k of the large itemsets found in the current level
+    """
+    def __init__(self, data, weights=None):
+        self.data = data
+        self.weights = weights
+        self.entries = None
+        self.ids = None
+        self.__pending = None
+
+    def count(self, candidates):
+        if self.entries is None:
+            weights = self.weights or [1] * len(self.data)
+            entries, ids = zip(weights, self.data), None
+        else:
+            entries, ids = self.entries, self.ids
+        # index candidates by their first generator
+        index = defaultdict(list)
+        for ci, candidate in enumerate(candidates):
+            if ids is None:
+                # generators of 2-candidates are single items
+                first, second = candidate[0], candidate[1]
+            else:
+                first = ids.get(tuple(candidate[:-1]))
+                second = ids.get(tuple(candidate[:-2] + candidate[-1:]))
+            index[first].append((ci, second))
+        counts = [0] * len(candidates)
+        contained = []
+        for weight, entry in entries:
+            found = []
+            for first in entry:
+                for ci, second in index.get(first, ()):
+                    if second in entry:
+                        found.append(ci)
+                        counts[ci] += weight
+            if found:
+                contained.append((weight, found))
+        self.seed(candidates, contained)
+        return counts
+
+    def seed(self, candidates, contained):
+        self.__pending = (candidates, contained)
+
+    def update(self, kplus):
+        candidates, contained = self.__pending
+        self.__pending = None
+        self.ids = dict((tuple(c), i) for i, c in enumerate(c for family in kplus for c in family))
+        # map candidate indices to IDs of large itemsets
+        large = dict((ci, self.ids[tuple(c)]) for ci, c in enumerate(candidates)
+                     if tuple(c) in self.ids)
+        entries = []
+        for weight, found in contained:
+            entry = set(large[ci] for ci in found if ci in large)
+            if len(entry) > 1:
+                entries.append((weight, entry))
+        if __debug__:
+            print "AprioriTid transactions left: {}".format(len(entries))
+        self.entries = entries
+
+class HybridCounter(object):
+    """
+    Counting backend of the AprioriHybrid algorithm, 2.4 of Rakesh's paper. 
+    It counts with the hash tree of the Apriori algorithm, then switches to 
+    AprioriTid at the end of a level if the estimated size of C^k (the sum 
+    of the counts of the candidates, plus the number of transactions) fits 
+    in budget and the number of candidates went down. The level after the 
+    switch is still counted with the hash tree, recording the candidates of 
+    each transaction to build the first C^k.
+
+    ...
+
+    Methods
+    -------
+    count(candidates)
+        number of occurrences of each candidate itemset
+    update(kplus)
+        notify the backend of the large itemsets found in the current level
+    """
+    def __init__(self, data, budget=HYBRID_BUDGET, weights=None):
+        self.budget = budget
+        self.__apriori = HashTreeCounter(data, weights=weights)
+        self.__tid = None
+        self.__last = None
+
+    @property
+    def data(self):
+        return self.__apriori.data if self.__apriori is not None else self.__tid.data
+
+    @data.setter
+    def data(self, data):
+        if self.__apriori is not None:
+            self.__apriori.data = data
+        else:
+            self.__tid.data = data
+
+    @property
+    def weights(self):
+        return self.__apriori.weights if self.__apriori is not None else self.__tid.weights
+
+    @weights.setter
+    def weights(self, weights):
+        if self.__apriori is not None:
+            self.__apriori.weights = weights
+        else:
+            self.__tid.weights = weights
+
+    def count(self, candidates):
+        if self.__tid is not None:
+            return self.__tid.count(candidates)
+        counts = self.__apriori.count(candidates)
+        if self.__apriori.record:
+            if __debug__:
+                print "Switching to AprioriTid"
+            self.__tid = TidCounter(self.data, weights=self.weights)
+            self.__tid.seed(candidates, self.__apriori.contained)
+            self.__apriori = None
+        else:
+            size = sum(counts) + len(self.data)
+            # switch when C^k fits and the candidates are getting fewer
+            self.__apriori.record = (
+                size <= self.budget and self.__last is not None and len(candidates) < self.__last)
+            self.__last = len(candidates)
+        return counts
+
+    def update(self, kplus):
+        if self.__tid is not None:
+            self.__tid.update(kplus)
+
+# available counting backends for itemsets_apriori()
+COUNTERS = {
+    'scan': ScanCounter,
+    'bitset': BitsetCounter,
+    'hashtree': HashTreeCounter,
+    'tid': TidCounter,
+    'hybrid': HybridCounter,
+    'numpy': NumpyCounter,
+}
+
+"""restore the state of a counting backend at the frontier of a resumed run
+The backends keeping state between levels rebuild it as they can: the 
+bitset backend computes the missing parent bitmaps on demand, while the 
+AprioriTid backend needs the C^k of the frontier, recorded in one pass of 
+the hash tree.
+
+Parameters
+----------
+counter : object
+    counting backend, see COUNTERS
+ksets : list[list[list[int]]]
+    the large k-itemsets of the last level completed
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+weights : list[int], optional
+    number of occurrences of each transaction, 1 each if not given
+"""
+def restore_counter(counter, ksets, data, weights=None):
+    if isinstance(counter, TidCounter):
+        if len(ksets[0][0]) == 1:
+            # data itself is C^1
+            return
+        frontier = [itemset for family in ksets for itemset in family]
+        tree = HashTreeCounter(data, weights=weights)
+        tree.record = True
+        tree.count(frontier)
+        counter.seed(frontier, tree.contained)
+    counter.update(ksets)
+
+"""Apriori candidate generation of (k+1)-itemsets from itemsets, without 
+counting them: the join of the itemsets sharing all but their last item, 
+pruned of the candidates with a k-subset not in itemsets
+Reference: 2.1.1 of Rakesh's paper - the "apriori-gen" function
+
+Parameters
+----------
+itemsets : collection of tuple(int)
+    sorted itemsets, e.g. the k-itemsets of one level; itemsets of 
+    different sizes are each joined with the itemsets of their size
+
+Returns
+-------
+list[tuple(int)]
+    candidates whose subsets one item smaller are all in itemsets
+"""
+def apriori_gen(itemsets):
+    itemsets = set(itemsets)
+    families = defaultdict(list)
+    for itemset in sorted(itemsets):
+        families[itemset[:-1]].append(itemset[-1])
+    candidates = []
+    for prefix, lasts in families.items():
+        for a, i in enumerate(lasts):
+            for j in lasts[a+1:]:
+                candidate = prefix + (i, j)
+                # the subsets without i or j are the two itemsets joined
+                if all(candidate[:m] + candidate[m+1:] in itemsets
+                       for m in xrange(len(prefix))):
+                    candidates.append(candidate)
+    return candidates
+
 """Apriori candidate generation function of (k+1)-itemsets given k-itemsets
 Reference: 2.1.1 of Rakesh's paper - the "apriori-gen" function
 
@@ -66,15 +664,24 @@ min_supp: float
     minimum support value for an itemset to be "large"
 total : int
     total number of transactions, used for computing support values
-itemsets: dict{tuple(int):float}
+itemsets: dict{tuple(int):float} or ItemsetTrie
     containing final results: large itemsets and their support values
+counter : object, optional
+    counting backend (see COUNTERS), scans data if not given
+buckets : array[int], optional
+    hash bucket counts of item pairs filled by apriori_gen_single_itemsets(), 
+    2-candidates whose bucket is not large are discarded without counting
+required : set(int), optional
+    items leading every itemset kept, see itemsets_apriori(); roots not 
+    starting with one of them generate no candidates
 
 Returns
 -------
 kplus : list[list[list[int]]]
     (k+1)-itemsets generated
 """
-def apriori_gen_k_itemsets(ksets, data, min_supp, total, itemsets):
+def apriori_gen_k_itemsets(ksets, data, min_supp, total, itemsets, counter=None, buckets=None, 
+                           required=None):
     if __debug__:
         # some work is needed to know how many items the sets currently contain
         if not ksets or not ksets[0]:
@@ -82,8 +689,17 @@ def apriori_gen_k_itemsets(ksets, data, min_supp, total, itemsets):
         else:
             dbg_n = len(ksets[0][0]) + 1
         print "Generating frequent {}-item itemsets".format(dbg_n)
-        dbg_count = 0
-    kplus = [] # the (k+1)-itemsets
+        dbg_count = dbg_hashed = 0
+    if counter is None:
+        counter = ScanCounter(data)
+    is_large = large_test(total, min_supp)
+    if buckets and ksets and len(ksets[0][0]) != 1:
+        # only 2-candidates are filtered
+        buckets = None
+
+    # generate all candidates of this level first, grouped by the families 
+    # they will form, then count them with the backend in one go
+    families = []
     for family in ksets:
         # family is a list of itemsets with the same k-1 items 
         # except the k-th (and last) item
@@ -97,28 +713,117 @@ def apriori_gen_k_itemsets(ksets, data, min_supp, total, itemsets):
             # root = [1,2,4], we have candidates [1,2,4,5],
             # root = [1,2,5], no more candidates as it is the last one
             root = family.pop(0)
+            if required is not None and root[0] not in required:
+                # only the 1-itemsets have such roots
+                continue
             for other in family:
                 candidate = root + other[-1:]
-                if subset_pruned(candidate, itemsets):
+                if subset_pruned(candidate, itemsets, required):
                     # candidate is pruned because one or more of its subsets 
                     # are not among existing large itemsets
                     continue
-                count = count_occurences(candidate, data)
-                supp = float(count) / total
-                if supp >= min_supp:
-                    # candidate is frequent enough, include it into itemsets
-                    candidates.append(candidate)
-                    itemsets[tuple(candidate)] = supp
-            # print candidates
+                if buckets:
+                    # the bucket count is an upper bound of the pair count
+                    h = (candidate[0] * DHP_MULTIPLIER + candidate[1]) % len(buckets)
+                    if not is_large(buckets[h]):
+                        if __debug__:
+                            dbg_hashed += 1
+                        continue
+                candidates.append(candidate)
             if candidates:
-                kplus.append(candidates)
-                if __debug__:
-                    # print "{} new candidates found".format(len(candidates))
-                    dbg_count += len(candidates)
+                families.append(candidates)
+    counts = iter(counter.count([c for family in families for c in family]))
+
+    kplus = [] # the (k+1)-itemsets
+    for family in families:
+        candidates = []
+        for candidate in family:
+            count = next(counts)
+            if is_large(count):
+                # candidate is frequent enough, include it into itemsets
+                candidates.append(candidate)
+                record_itemset(itemsets, candidate, count, total)
+        if candidates:
+            kplus.append(candidates)
+            if __debug__:
+                dbg_count += len(candidates)
+    counter.update(kplus)
     if __debug__:
+        if buckets:
+            print "Candidates discarded by hash buckets: {}".format(dbg_hashed)
         print "{}-item itemsets extracted: {}".format(dbg_n, dbg_count)
     return kplus
 
+"""generate the large 2-itemsets by direct counting in a triangular matrix
+All pairs of large items are candidates of the second iteration, which is 
+where the number of candidates peaks. Instead of counting them one by one, 
+data is scanned once and each transaction increments the count of all pairs 
+of large items it contains. The counts are stored in a packed upper 
+triangular array indexed by the ranks (i, j), i < j, of the items of a pair: 
+the count of (i, j) is at i * (2n - i - 1) / 2 + (j - i - 1), where n is the 
+number of large items.
+
+Parameters
+----------
+ksets : list[list[list[int]]]
+    the large 1-itemsets, as returned by apriori_gen_single_itemsets()
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+min_supp: float
+    minimum support value for an itemset to be "large"
+total : int
+    total number of transactions, used for computing support values
+itemsets: dict{tuple(int):float} or ItemsetTrie
+    containing final results: large itemsets and their support values
+required : set(int), optional
+    items leading every itemset kept, see itemsets_apriori()
+weights : list[int], optional
+    number of occurrences of each transaction, 1 each if not given
+
+Returns
+-------
+kplus : list[list[list[int]]]
+    2-itemsets generated, same as apriori_gen_k_itemsets()
+"""
+def apriori_gen_pair_itemsets(ksets, data, min_supp, total, itemsets, required=None, 
+                              weights=None):
+    if __debug__:
+        print "Generating frequent 2-item itemsets (triangular matrix)"
+        dbg_count = 0
+    items = sorted(itemset[0] for family in ksets for itemset in family)
+    n = len(items)
+    rank = dict((item, i) for i, item in enumerate(items))
+    counts = array('l', [0]) * (n * (n - 1) // 2)
+    for tid, trans in enumerate(data):
+        weight = 1 if weights is None else weights[tid]
+        ranks = sorted(rank[item] for item in trans if item in rank)
+        for a, i in enumerate(ranks):
+            # offset of row i, minus the (i + 1) columns left of the diagonal
+            base = i * (2 * n - i - 1) // 2 - i - 1
+            for j in ranks[a+1:]:
+                counts[base + j] += weight
+
+    is_large = large_test(total, min_supp)
+    kplus = []
+    for i in xrange(n - 1):
+        if required is not None and items[i] not in required:
+            continue
+        base = i * (2 * n - i - 1) // 2 - i - 1
+        candidates = []
+        for j in xrange(i + 1, n):
+            count = counts[base + j]
+            if is_large(count):
+                candidate = [items[i], items[j]]
+                candidates.append(candidate)
+                record_itemset(itemsets, candidate, count, total)
+        if candidates:
+            kplus.append(candidates)
+            if __debug__:
+                dbg_count += len(candidates)
+    if __debug__:
+        print "2-item itemsets extracted: {}".format(dbg_count)
+    return kplus
+
 """Apriori candidate generation function of single-item itemsets
 Reference: Chapter 2.1.1 of Rakesh's paper - the "apriori-gen" function
 
@@ -128,8 +833,18 @@ data : list[set(int)]
     list of transactions, each transaction is a set of integer items
 min_supp: float
     minimum support value for an itemset to be "large"
-itemsets: dict{tuple(int):float}
+itemsets: dict{tuple(int):float} or ItemsetTrie
     containing final results: large itemsets and their support values
+buckets : array[int], optional
+    hash bucket counts, filled with the number of occurrences of the item 
+    pairs hashed into each bucket
+    Reference: An Effective Hash-Based Algorithm for Mining Association 
+    Rules by Park, Chen and Yu - the DHP algorithm
+required : set(int), optional
+    items leading every itemset kept, see itemsets_apriori(); the other 
+    items are returned but not recorded
+weights : list[int], optional
+    number of occurrences of each transaction, 1 each if not given
 
 Returns
 -------
@@ -139,35 +854,91 @@ res : list[list[list[int]]]
 total : int
     total number of transactions
 """
-def apriori_gen_single_itemsets(data, min_supp, itemsets):
+def apriori_gen_single_itemsets(data, min_supp, itemsets, buckets=None, required=None, 
+                                weights=None):
     if __debug__:
         print "Generating frequent 1-item itemsets"
     candidates = []
     total = 0 #denominator
     counts = defaultdict(int)
-    for trans in data:
-        total += 1
+    nbuckets = len(buckets) if buckets else 0
+    for tid, trans in enumerate(data):
+        weight = 1 if weights is None else weights[tid]
+        total += weight
         for item in trans:
-            counts[item] += 1
+            counts[item] += weight
+        if nbuckets:
+            # hash all pairs of the transaction while it is at hand
+            items = sorted(trans)
+            for a, i in enumerate(items):
+                base = i * DHP_MULTIPLIER
+                for j in items[a+1:]:
+                    buckets[(base + j) % nbuckets] += weight
     if __debug__:
         print "Total number of transactions: {}".format(total)
 
     # filter items that are less frequent
+    is_large = large_test(total, min_supp)
     for item, count in counts.items():
-        supp = float(count) / total
-        if supp >= min_supp:
+        if is_large(count):
             # item should be included
             candidates.append([item])
-            itemsets[tuple([item])] = supp
+            if required is None or item in required:
+                record_itemset(itemsets, [item], count, total)
 
     # if 1-itemsets are sorted, the algorithm ensures that all itemsets 
     # generated in following iterations are all sorted internally
     candidates.sort() 
+    if required is not None and candidates:
+        lead = [c[0] for c in candidates if c[0] in required]
+        if lead and lead[-1] != candidates[len(lead) - 1][0]:
+            raise ValueError("[ERROR] Required items must come first in the order of items")
     res = [candidates] if candidates else []
     if __debug__:
         print "1-item itemsets extracted: {}".format(len(candidates))
     return res, total
 
+"""trim the transactions before counting the (k+1)-itemsets
+Items that belong to no large k-itemset cannot appear in a large 
+(k+1)-itemset and are removed from the transactions; transactions left with 
+k items or less cannot contain a (k+1)-itemset and are removed from data.
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+ksets : list[list[list[int]]]
+    the large k-itemsets, see apriori_gen_k_itemsets()
+weights : list[int], optional
+    number of occurrences of each transaction
+
+Returns
+-------
+list[set(int)]
+    the trimmed transactions
+list[int]
+    the weights of the trimmed transactions, None if weights is None
+"""
+def trim_transactions(data, ksets, weights=None):
+    k = len(ksets[0][0])
+    live = set(item for family in ksets for itemset in family for item in itemset)
+    trimmed = []
+    trimmed_weights = None if weights is None else []
+    if __debug__:
+        dbg_items = set()
+    for tid, trans in enumerate(data):
+        if __debug__:
+            dbg_items.update(trans)
+        trans = trans & live
+        if len(trans) > k:
+            trimmed.append(trans)
+            if weights is not None:
+                trimmed_weights.append(weights[tid])
+    if __debug__:
+        print "Trimmed transactions: {} removed, {} left; items: {} removed, {} left".format(
+            len(data) - len(trimmed), len(trimmed), len(dbg_items - live), len(live))
+    return trimmed, trimmed_weights
+
 """generate large(frequent) itemsets using Apriori algorithm
 Reference: Fast Algorithms for Mining Association Rules by Rakesh et al.
 (http://www.cs.columbia.edu/%7Egravano/Qual/Papers/agrawal94.pdf)
@@ -178,16 +949,202 @@ data : list[set(int)]
     list of transactions, each transaction is a set of integer items
 min_supp: float
     minimum support value for an itemset to be "large"
+counting : str or object, optional
+    name of the counting backend in COUNTERS, 'scan' by default, or a 
+    counting backend instance, e.g. NumpyCounter(data, chunk_rows)
+trim : boolean, optional
+    trim a working copy of data after each level, see trim_transactions(), 
+    which shrinks the transactions scanned by the counting backend; the 
+    bitset and numpy backends do not scan them but rebuild their bitmaps 
+    once transactions are removed, which shortens the bitmaps
+trie : boolean, optional
+    store the large itemsets and their counts in an ItemsetTrie, whose 
+    nodes are array columns of 32 bytes each instead of the tuple, float 
+    and hash slot of a dict entry, about a third of the memory of a dict
+triangular : boolean, optional
+    count the 2-itemsets directly, see apriori_gen_pair_itemsets()
+dhp_buckets : int, optional
+    number of hash buckets of item pairs used to discard 2-candidates, see 
+    apriori_gen_single_itemsets(), 0 (disabled) by default
+required : set(int), optional
+    only generate the itemsets containing at least one of these items, 
+    which must be smaller than all the other items (see push_constraints()): 
+    such an itemset starts with one of them, and so do both itemsets it is 
+    joined from, so the branches of the other roots are never counted
+weights : list[int], optional
+    number of occurrences of each transaction, e.g. when data only holds 
+    the distinct transactions (see CSVData), 1 each if not given; a counting 
+    backend instance must have been given the same weights
+checkpoint : str, optional
+    name of the file the state of the algorithm is saved to after each 
+    level, see save_checkpoint()
+resume : boolean, optional
+    continue from the last level saved in checkpoint if it exists, which 
+    must have been written with the same data, min_supp and required items
 
 Returns
 -------
-itemsets : dict{tuple(int):float}
+itemsets : dict{tuple(int):float} or ItemsetTrie
     key-value pairs of large itemsets (tuple of integers) and their support 
     value in the data
 """
-def itemsets_apriori(data, min_supp):
-    itemsets = {}
-    ksets, total = apriori_gen_single_itemsets(data, min_supp, itemsets)
+def itemsets_apriori(data, min_supp, counting='scan', trim=False, trie=False, 
+                     triangular=False, dhp_buckets=0, required=None, weights=None, 
+                     checkpoint=None, resume=False):
+    if isinstance(counting, basestring):
+        if counting not in COUNTERS:
+            raise ValueError("[ERROR] Invalid counting method: {}".format(counting))
+        counter = COUNTERS[counting](data, weights=weights)
+    else:
+        counter = counting
+    if triangular and isinstance(counter, TidCounter):
+        # AprioriTid needs the 2-itemsets of each transaction from the counting
+        raise ValueError("[ERROR] Triangular counting is not supported by AprioriTid")
+    total = len(data) if weights is None else sum(weights)
+    itemsets = ItemsetTrie(total) if trie else {}
+    buckets = array('l', [0]) * dhp_buckets if dhp_buckets > 0 else None
+    if checkpoint is not None:
+        fingerprint = dataset_fingerprint(data, min_supp, weights, required)
+    if resume and checkpoint is not None and os.path.isfile(checkpoint):
+        saved, total, ksets, counts = load_checkpoint(checkpoint)
+        if saved != fingerprint:
+            raise ValueError("[ERROR] Checkpoint of other data or settings: {}".format(checkpoint))
+        for itemset, count in counts.items():
+            record_itemset(itemsets, itemset, count, total)
+        if ksets:
+            restore_counter(counter, ksets, data, weights)
+        # the buckets were filled by the first level, 2-candidates are counted
+        buckets = None
+        if __debug__:
+            print "Resumed {} itemsets from {}".format(len(counts), checkpoint)
+    else:
+        ksets, total = apriori_gen_single_itemsets(data, min_supp, itemsets, buckets, required, 
+                                                   weights)
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, fingerprint, total, ksets, itemsets)
     while ksets:
-        ksets = apriori_gen_k_itemsets(ksets, data, min_supp, total, itemsets)
+        if trim:
+            data, weights = trim_transactions(data, ksets, weights)
+            counter.data, counter.weights = data, weights
+        if triangular and len(ksets[0][0]) == 1:
+            ksets = apriori_gen_pair_itemsets(ksets, data, min_supp, total, itemsets, required, 
+                                              weights)
+            counter.update(ksets)
+        else:
+            ksets = apriori_gen_k_itemsets(ksets, data, min_supp, total, itemsets, counter, 
+                                           buckets, required)
+        # the buckets are only used by 2-candidates
+        buckets = None
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, fingerprint, total, ksets, itemsets)
+    return itemsets
+
+"""record the count of an itemset in the min-heap of the k largest counts 
+of the itemsets of at least min_size items counted by itemsets_topk(); 
+once the heap holds k counts, no itemset counted below the smallest one 
+can be among the k most frequent, nor can its extensions
+
+Parameters
+----------
+best : list[int]
+    min-heap of at most k counts, updated in place
+count : int
+    number of occurrences of the itemset
+k : int
+    number of itemsets returned by itemsets_topk()
+
+Returns
+-------
+int
+    smallest count of an itemset which can still be returned, 0 until k 
+    counts have been recorded
+"""
+def raise_topk_bound(best, count, k):
+    if len(best) < k:
+        heappush(best, count)
+    elif count > best[0]:
+        heapreplace(best, count)
+    return best[0] if len(best) == k else 0
+
+"""generate the k most frequent itemsets, without a support threshold
+The itemsets are enumerated best-first: starting from the single items, 
+the itemset of highest count (ties broken by the order of items) is popped 
+from a priority queue and its extensions by each larger item are pushed. 
+Since an extension never has a higher count or a lower order than its 
+itemset, itemsets are popped in descending order of count, and the search 
+stops as soon as k itemsets of at least min_size items have been popped. 
+Once k itemsets of at least min_size items have been pushed, the smallest 
+of their counts bounds the counts of the results from below, and it rises 
+as better itemsets are counted (see raise_topk_bound()): the extensions 
+counted below it are not pushed, and the queued itemsets below it are 
+discarded whenever the queue doubles.
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+k : int
+    number of itemsets to return
+min_size : int, optional
+    minimum number of items of the returned itemsets, 1 by default
+min_supp: float, optional
+    minimum support value of the returned itemsets, 0 by default
+weights : list[int], optional
+    number of occurrences of each transaction, 1 each if not given
+
+Returns
+-------
+itemsets : dict{tuple(int):float}
+    key-value pairs of the k (or less) most frequent itemsets (tuple of 
+    integers) and their support value in the data
+"""
+def itemsets_topk(data, k, min_size=1, min_supp=0.0, weights=None):
+    if k <= 0 or min_size <= 0:
+        raise ValueError("[ERROR] Invalid number or size of itemsets: {}, {}".format(k, min_size))
+    total = len(data) if weights is None else sum(weights)
+    itemsets = {}
+    if not total:
+        return itemsets
+    bitsets = build_tid_bitsets(data)
+    planes = weight_planes(weights)
+    items = sorted(bitsets)
+    is_large = large_test(total, min_supp)
+    # the queue holds (-count, itemset, bitmap, position of the last item), 
+    # best the k largest counts of the itemsets of min_size items pushed
+    queue = []
+    best = []
+    bound = 0
+    for i, item in enumerate(items):
+        count = weighted_popcount(bitsets[item], planes)
+        if count >= bound and is_large(count):
+            heappush(queue, (-count, (item,), bitsets[item], i))
+            if min_size == 1:
+                bound = raise_topk_bound(best, count, k)
+    # the queue is filtered when it grows past twice its size after the 
+    # last filtering, which keeps the cost of filtering linear
+    limit = 2 * max(len(queue), k)
+    if __debug__:
+        dbg_count, dbg_peak = 0, len(queue)
+    while queue and len(itemsets) < k:
+        count, itemset, bits, last = heappop(queue)
+        if len(itemset) >= min_size:
+            itemsets[itemset] = float(-count) / total
+        kept = len(itemset) + 1 >= min_size
+        for i in xrange(last + 1, len(items)):
+            ibits = bits & bitsets[items[i]]
+            icount = weighted_popcount(ibits, planes)
+            if icount and icount >= bound and is_large(icount):
+                heappush(queue, (-icount, itemset + (items[i],), ibits, i))
+                if kept:
+                    bound = raise_topk_bound(best, icount, k)
+        if len(queue) > limit:
+            queue = [entry for entry in queue if -entry[0] >= bound]
+            heapify(queue)
+            limit = 2 * max(len(queue), k)
+        if __debug__:
+            dbg_count += 1
+            dbg_peak = max(dbg_peak, len(queue))
+    if __debug__:
+        print "Itemsets expanded: {}, largest queue: {}, left in queue: {}".format(
+            dbg_count, dbg_peak, len(queue))
     return itemsets
@@ -0,0 +1,112 @@
+import os
+import zlib
+import marshal
+import hashlib
+from array import array
+from collections import defaultdict
+
+# first bytes of a checkpoint file, changed with the format
+CHECKPOINT_MAGIC = 'APRCKPT1'
+
+"""compute the fingerprint of the encoded data and the settings a run of the
+Apriori algorithm depends on, so that a checkpoint is never resumed on other
+data, e.g. after the CSV file changed
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+min_supp: float
+    minimum support value for an itemset to be "large"
+weights : list[int], optional
+    number of occurrences of each transaction
+required : set(int), optional
+    items leading every itemset, see itemsets_apriori()
+
+Returns
+-------
+str
+    MD5 hex digest
+"""
+def dataset_fingerprint(data, min_supp, weights=None, required=None):
+    digest = hashlib.md5()
+    digest.update(repr((min_supp, None if required is None else sorted(required))))
+    for tid, trans in enumerate(data):
+        weight = 1 if weights is None else weights[tid]
+        digest.update(array('l', [len(trans), weight] + sorted(trans)).tostring())
+    return digest.hexdigest()
+
+"""write the state of the Apriori algorithm after a level
+The large itemsets are grouped by size, each group stored as two arrays of
+integers (the items of the itemsets one after the other, and their counts),
+and the frontier as the sizes of its families and their items; the whole is
+compressed with zlib. The file is written under a temporary name and then
+renamed, so that a run killed while writing leaves the previous checkpoint.
+
+Parameters
+----------
+filename : str
+    name of the checkpoint file
+fingerprint : str
+    fingerprint of the data and settings, see dataset_fingerprint()
+total : int
+    total number of transactions, used for computing support values
+ksets : list[list[list[int]]]
+    the large k-itemsets of the last level, see apriori_gen_k_itemsets()
+itemsets : dict{tuple(int):float} or ItemsetTrie
+    all large itemsets found so far and their support values
+"""
+def save_checkpoint(filename, fingerprint, total, ksets, itemsets):
+    levels = defaultdict(lambda: (array('l'), array('l')))
+    for itemset, supp in itemsets.items():
+        items, counts = levels[len(itemset)]
+        items.extend(itemset)
+        counts.append(int(round(supp * total)))
+    k = len(ksets[0][0]) if ksets else 0
+    sizes = array('l', [len(family) for family in ksets])
+    frontier = array('l', [item for family in ksets for itemset in family for item in itemset])
+    payload = marshal.dumps((fingerprint, total, k, sizes.tostring(), frontier.tostring(),
+        dict((n, (items.tostring(), counts.tostring())) for n, (items, counts) in levels.items())))
+    tmpname = filename + '.tmp'
+    with open(tmpname, 'wb') as outfile:
+        outfile.write(CHECKPOINT_MAGIC)
+        outfile.write(zlib.compress(payload))
+        outfile.flush()
+        os.fsync(outfile.fileno())
+    os.rename(tmpname, filename)
+
+"""read the state of the Apriori algorithm written by save_checkpoint()
+
+Parameters
+----------
+filename : str
+    name of the checkpoint file
+
+Returns
+-------
+fingerprint : str
+    fingerprint of the data and settings of the run
+total : int
+    total number of transactions
+ksets : list[list[list[int]]]
+    the large k-itemsets of the last level completed
+counts : dict{tuple(int):int}
+    all large itemsets found so far and their number of occurrences
+"""
+def load_checkpoint(filename):
+    with open(filename, 'rb') as infile:
+        if infile.read(len(CHECKPOINT_MAGIC)) != CHECKPOINT_MAGIC:
+            raise ValueError("[ERROR] Invalid checkpoint file: {}".format(filename))
+        fingerprint, total, k, sizes, frontier, levels = marshal.loads(
+            zlib.decompress(infile.read()))
+    sizes, frontier = array('l', sizes), array('l', frontier)
+    ksets, pos = [], 0
+    for size in sizes:
+        ksets.append([frontier[pos + i * k:pos + (i + 1) * k].tolist() for i in xrange(size)])
+        pos += size * k
+    counts = {}
+    for n, (items, level) in levels.items():
+        items, level = array('l', items), array('l', level)
+        for i, count in enumerate(level):
+            counts[tuple(items[i * n:(i + 1) * n])] = count
+    return fingerprint, total, ksets, counts
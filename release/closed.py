@@ -0,0 +1,225 @@
+from apriori import build_tid_bitsets, popcount, large_test
+
+"""prepare the transaction-ID bitmaps of the large items of data
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+is_large : function(int) -> boolean
+    tells if an itemset with the given count is "large"
+
+Returns
+-------
+list[tuple(int, long, int)]
+    item, bitmap and count of each large item, in ascending order of count
+"""
+def large_item_bitsets(data, is_large):
+    items = []
+    for item, bits in build_tid_bitsets(data).items():
+        count = popcount(bits)
+        if is_large(count):
+            items.append((item, bits, count))
+    items.sort(key=lambda x: (x[2], x[0]))
+    return items
+
+"""extend a closed itemset with prefix-preserving closure extensions
+Reference: LCM ver. 2: Efficient Mining Algorithms for Frequent/Closed/
+Maximal Itemsets by Uno et al.
+The closure of an itemset X is the set of items contained in all the
+transactions containing X. For each large item e after core (in the order
+of items) not in the closed itemset, the closure of closed + [e] is
+computed; it is only kept if it adds no item before e, which guarantees
+every closed itemset is generated exactly once, from its unique parent.
+
+Parameters
+----------
+closed : set(int)
+    positions (in items) of the items of a closed itemset
+bits : long
+    transaction-ID bitmap of the closed itemset
+core : int
+    position of the item that generated closed, -1 for the root
+items : list[tuple(int, long, int)]
+    item, bitmap and count of each large item, see large_item_bitsets()
+is_large : function(int) -> boolean
+    tells if an itemset with the given count is "large"
+total : int
+    total number of transactions, used for computing support values
+itemsets: dict{tuple(int):float}
+    containing final results: closed itemsets and their support values
+"""
+def closed_extend(closed, bits, core, items, is_large, total, itemsets):
+    for e in xrange(core + 1, len(items)):
+        if e in closed:
+            continue
+        ebits = bits & items[e][1]
+        count = popcount(ebits)
+        if not is_large(count):
+            continue
+        closure = set(i for i, (_, ibits, _) in enumerate(items) if ebits & ibits == ebits)
+        if any(i not in closed for i in closure if i < e):
+            # not prefix-preserving, generated from another parent
+            continue
+        itemsets[tuple(sorted(items[i][0] for i in closure))] = float(count) / total
+        closed_extend(closure, ebits, e, items, is_large, total, itemsets)
+
+"""generate closed large itemsets
+An itemset is closed if none of its supersets has the same support. The
+closed large itemsets and their supports determine the support of every
+large itemset (see expand_closed()), with far fewer itemsets on dense data.
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+min_supp: float
+    minimum support value for an itemset to be "large"
+
+Returns
+-------
+itemsets : dict{tuple(int):float}
+    key-value pairs of closed large itemsets (tuple of integers) and their
+    support value in the data
+"""
+def itemsets_closed(data, min_supp):
+    total = len(data)
+    itemsets = {}
+    if not total:
+        return itemsets
+    is_large = large_test(total, min_supp)
+    items = large_item_bitsets(data, is_large)
+    if __debug__:
+        print "1-item itemsets extracted: {}".format(len(items))
+    # the closure of the empty itemset: items contained in all transactions
+    every = set(i for i, (_, _, count) in enumerate(items) if count == total)
+    if every:
+        itemsets[tuple(sorted(items[i][0] for i in every))] = 1.0
+    closed_extend(every, (1 << total) - 1, -1, items, is_large, total, itemsets)
+    if __debug__:
+        print "Closed itemsets extracted: {}".format(len(itemsets))
+    return itemsets
+
+"""derive all large itemsets and their supports from the closed ones
+The support of an itemset is the support of its closure, i.e. the highest
+support of its closed supersets. Subsets are derived level by level, from
+the largest itemsets down, each (k-1)-subset taking the highest support of
+the k-itemsets it comes from and of itself if it is closed.
+
+Parameters
+----------
+closed : dict{tuple(int):float}
+    closed large itemsets and their support values, see itemsets_closed()
+
+Returns
+-------
+itemsets : dict{tuple(int):float}
+    key-value pairs of large itemsets (tuple of integers) and their support
+    value in the data, same as itemsets_apriori()
+"""
+def expand_closed(closed):
+    itemsets = {}
+    if not closed:
+        return itemsets
+    k = max(len(itemset) for itemset in closed)
+    level = {}
+    while k > 0:
+        for itemset, supp in closed.items():
+            if len(itemset) == k and level.get(itemset, 0) < supp:
+                level[itemset] = supp
+        itemsets.update(level)
+        lower = {}
+        for itemset, supp in level.items():
+            for i in xrange(k):
+                subset = itemset[:i] + itemset[i+1:]
+                if subset and lower.get(subset, 0) < supp:
+                    lower[subset] = supp
+        level = lower
+        k -= 1
+    return itemsets
+
+"""search maximal large itemsets depth-first with look-ahead
+Reference: Efficiently Mining Long Patterns from Databases by Bayardo
+Each node of the search has a head itemset and a tail of items that can
+extend it. If head + tail is large, so are all the itemsets of the subtree,
+which is not searched further (look-ahead); so is a subtree whose head +
+tail is contained in a maximal itemset already found. Tails are ordered by
+ascending support, so that frequent items end up in most tails.
+
+Parameters
+----------
+head : list[int]
+    positions (in items) of the items of the head itemset
+bits : long
+    transaction-ID bitmap of head
+tail : list[tuple(int, long, int)]
+    position, bitmap and count of head + each tail item
+is_large : function(int) -> boolean
+    tells if an itemset with the given count is "large"
+found : list[tuple(frozenset(int), int)]
+    maximal itemsets (positions in items) found so far, and their counts
+"""
+def maximal_extend(head, bits, tail, is_large, found):
+    everything = frozenset(head + [t[0] for t in tail])
+    if any(everything <= itemset for itemset, _ in found):
+        return
+    if tail:
+        lookahead = bits
+        for _, tbits, _ in tail:
+            lookahead &= tbits
+        count = popcount(lookahead)
+        if is_large(count):
+            found.append((everything, count))
+            return
+    for n, (e, ebits, ecount) in enumerate(tail):
+        child = []
+        for f, fbits, _ in tail[n+1:]:
+            cbits = ebits & fbits
+            ccount = popcount(cbits)
+            if is_large(ccount):
+                child.append((f, cbits, ccount))
+        child.sort(key=lambda x: x[2])
+        if child:
+            maximal_extend(head + [e], ebits, child, is_large, found)
+        else:
+            itemset = frozenset(head + [e])
+            if not any(itemset <= other for other, _ in found):
+                found.append((itemset, ecount))
+
+"""generate maximal large itemsets
+An itemset is maximal if none of its supersets is large. The maximal large
+itemsets determine which itemsets are large, but not their supports.
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+min_supp: float
+    minimum support value for an itemset to be "large"
+
+Returns
+-------
+itemsets : dict{tuple(int):float}
+    key-value pairs of maximal large itemsets (tuple of integers) and their
+    support value in the data
+"""
+def itemsets_maximal(data, min_supp):
+    total = len(data)
+    itemsets = {}
+    if not total:
+        return itemsets
+    is_large = large_test(total, min_supp)
+    items = large_item_bitsets(data, is_large)
+    if __debug__:
+        print "1-item itemsets extracted: {}".format(len(items))
+    found = []
+    tail = [(i, bits, count) for i, (_, bits, count) in enumerate(items)]
+    maximal_extend([], (1 << total) - 1, tail, is_large, found)
+    # an itemset found before a superset of it is not maximal
+    found.sort(key=lambda x: -len(x[0]))
+    for n, (itemset, count) in enumerate(found):
+        if not any(itemset < other for other, _ in found[:n]):
+            itemsets[tuple(sorted(items[i][0] for i in itemset))] = float(count) / total
+    if __debug__:
+        print "Maximal itemsets extracted: {}".format(len(itemsets))
+    return itemsets
@@ -0,0 +1,80 @@
+from itertools import combinations
+from itemstore import ItemsetTrie
+
+"""push item constraints into the data mined by the Apriori algorithm
+Excluded items are removed from the transactions, so that they are never
+counted, and the items are renumbered so that the required ones come
+first, as itemsets_apriori(data, min_supp, required=...) needs.
+
+Parameters
+----------
+csvdata : CSVData
+    data whose transactions are filtered and renumbered in place
+required : set(int)
+    integer IDs of the items any itemset must contain one of
+excluded : set(int)
+    integer IDs of the items no itemset may contain
+
+Returns
+-------
+set(int)
+    new integer IDs of the required items
+"""
+def push_constraints(csvdata, required, excluded):
+    if excluded:
+        # emptied transactions are kept, they still count in the support values
+        csvdata.data = [trans - excluded for trans in csvdata.data]
+    mapping = csvdata.renumber(sorted(required - excluded))
+    return set(mapping[i] for i in required - excluded)
+
+"""count the support values the rules of constrained itemsets need
+When only the itemsets containing required items are mined, the LHS of a
+rule may not contain any, e.g. the LHS of {r, a} => {r}; so may the RHS,
+whose support the metrics of the rule need, see rule_metrics(). They are
+counted in one more pass over data.
+
+Parameters
+----------
+itemsets : dict{tuple(int):float}
+    large itemsets and their support values, as returned by
+    itemsets_apriori(data, min_supp, required=...)
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+rhs_items : set(int), optional
+    only the rules whose RHS items are all among these items are generated
+weights : list[int], optional
+    number of occurrences of each transaction, 1 each if not given
+max_rhs : int, optional
+    maximum number of items in RHS of the rules, 1 by default
+
+Returns
+-------
+dict{tuple(int):float}
+    key-value pairs of the LHS and RHS missing from itemsets and their
+    support value in the data
+"""
+def lhs_supports(itemsets, data, rhs_items=None, weights=None, max_rhs=1):
+    missing = ItemsetTrie(len(data) if weights is None else sum(weights))
+    for itemset in itemsets:
+        if len(itemset) < 2:
+            continue
+        for i, item in enumerate(itemset):
+            if rhs_items is not None and item not in rhs_items:
+                continue
+            for subset in (itemset[:i] + itemset[i+1:], (item,)):
+                if subset not in itemsets and subset not in missing:
+                    missing.add(subset, 0)
+        # LHS and RHS of the rules with several items in RHS
+        allowed = [item for item in itemset if rhs_items is None or item in rhs_items]
+        for m in xrange(2, min(max_rhs, len(itemset) - 1) + 1):
+            for rhs in combinations(allowed, m):
+                lhs = tuple(item for item in itemset if item not in rhs)
+                for subset in (lhs, rhs):
+                    if subset not in itemsets and subset not in missing:
+                        missing.add(subset, 0)
+    if len(missing):
+        for tid, trans in enumerate(data):
+            missing.increment_subsets(sorted(trans), 1 if weights is None else weights[tid])
+    if __debug__:
+        print "Support values of rules counted: {}".format(len(missing))
+    return dict(missing.items())
@@ -1,4 +1,6 @@
 import csv
+from fnmatch import fnmatchcase
+from apriori import large_test
 
 class CSVData(object):
     """
@@ -15,19 +17,39 @@ class CSVData(object):
     id2item : dict{int:str}
         mapping an integer ID to an item in the original CSV data
     data : list[set(int)]
-        rows in original CSV data mapped to list of a set of integers
+        rows in original CSV data mapped to list of a set of integers, empty 
+        if no CSV file is given (see iter_rows() for streaming rows instead); 
+        identical rows are only stored once if dedup is True
+    weights : list[int]
+        number of rows of each set in data if dedup is True, None otherwise
 
     Methods
     -------
+    item_id(item)
+        map an item in original CSV to its integer, assigning a new one if needed
+    iter_rows(csvname)
+        iterate over the rows of a CSV file mapped to sets of integers
+    load_vocabulary(id2item)
+        use the given integers of the items, e.g. of saved rules
+    encode_rows(csvname)
+        iterate over the rows of a CSV file mapped to the known integers only
+    match(patterns)
+        integers of the items matching any of the shell-style patterns
+    renumber(first)
+        renumber the items so that the given integers come first
+    recode(min_supp, order)
+        drop the items never large and renumber the others by frequency
     item_list(id_list)
         map a list of integers to their corresponding items in original CSV
     """
-    def __init__(self, csvname):
+    def __init__(self, csvname, dedup=False):
         self.item2id = {}
         self.id2item = {}
         self.data = []
+        self.weights = None
         self.maxid = 0
-        self.__construct(csvname)
+        if csvname is not None:
+            self.__construct(csvname, dedup)
 
     """map data from original CSV into integer ID
     
@@ -35,32 +57,77 @@ class CSVData(object):
     ----------
     csvname : str
         name of the CSV file
+    dedup : boolean
+        store identical rows once, counting them in weights
     """
-    def __construct(self, csvname):
+    def __construct(self, csvname, dedup):
+        if __debug__:
+            print "Constructing indices of CSV data"
+        if dedup:
+            self.weights = []
+            unique = {}
+        for d in self.iter_rows(csvname):
+            if dedup:
+                key = frozenset(d)
+                i = unique.get(key)
+                if i is not None:
+                    self.weights[i] += 1
+                    continue
+                unique[key] = len(self.data)
+                self.weights.append(1)
+            # add an valid row into datasets
+            self.data.append(d)
+        if __debug__ and dedup:
+            print "{} distinct rows out of {}".format(len(self.data), sum(self.weights))
+
+    """maps an item of original CSV to its integer ID, assigning a new ID to 
+    an item never seen before
+    
+    Parameters
+    ----------
+    item : unicode
+        item value in original CSV data
+    
+    Returns
+    -------
+    int
+    """
+    def item_id(self, item):
+        i = self.item2id.get(item, None)
+        if i is None:
+            # item does NOT have an associated ID,
+            # assign ID to item
+            self.maxid += 1
+            self.item2id[item] = self.maxid
+            self.id2item[self.maxid] = item
+            i = self.maxid
+        return i
+
+    """iterate over the rows of a CSV file mapped to sets of integer IDs, 
+    sharing (and extending) the IDs of this data; empty rows are skipped
+    
+    Parameters
+    ----------
+    csvname : str
+        name of the CSV file
+    
+    Returns
+    -------
+    generator of set(int)
+    """
+    def iter_rows(self, csvname):
         with open(csvname, 'r') as csvfile:
             csvreader = csv.reader(csvfile, delimiter=',', quotechar='\"')
             if __debug__:
-                print "Constructing indices of CSV data"
                 dbg_count = 0
             for row in csvreader:
                 d = set()
                 for item in row:
                     if not item: continue
-                    # decode utf-8 for internal use
-                    item = item.decode('utf-8')
-                    i = self.item2id.get(item, None)
-                    if i is None:
-                        # item does NOT have an associated ID,
-                        # assign ID to item
-                        self.maxid += 1
-                        self.item2id[item] = self.maxid
-                        self.id2item[self.maxid] = item
-                        i = self.maxid
-                    # add ID into the current row 
-                    d.add(i)
+                    # decode utf-8 for internal use, add ID into the current row 
+                    d.add(self.item_id(item.decode('utf-8')))
                 if d:
-                    # add an valid row into datasets
-                    self.data.append(d)
+                    yield d
                 if __debug__:
                     dbg_count += 1
                     if dbg_count % 20000 == 0:
@@ -68,6 +135,127 @@ class CSVData(object):
             if __debug__:
                 print "All {} lines processed".format(dbg_count)
 
+    """use the given mapping of integer IDs to items, e.g. the vocabulary of 
+    the rules of an index, instead of the IDs assigned while reading data
+    
+    Parameters
+    ----------
+    id2item : dict{int:unicode}
+        mapping an integer ID to an item in the original CSV data
+    """
+    def load_vocabulary(self, id2item):
+        self.id2item = dict(id2item)
+        self.item2id = dict((item, i) for i, item in self.id2item.items())
+        self.maxid = max(self.id2item) if self.id2item else 0
+
+    """iterate over the rows of a CSV file mapped to sorted lists of the 
+    integer IDs of this data; items without an ID are dropped rather than 
+    assigned one, and empty rows are not skipped, so that the n-th list is 
+    the n-th row of the file
+    
+    Parameters
+    ----------
+    csvname : str
+        name of the CSV file
+    
+    Returns
+    -------
+    generator of list[int]
+    """
+    def encode_rows(self, csvname):
+        # look up the utf-8 bytes of the items, saving the decoding of each item
+        codes = dict((item.encode('utf-8'), i) for item, i in self.item2id.items())
+        get = codes.get
+        with open(csvname, 'r') as csvfile:
+            for row in csv.reader(csvfile, delimiter=',', quotechar='\"'):
+                items = set(map(get, row))
+                items.discard(None)
+                yield sorted(items)
+
+    """find the items matching shell-style patterns, e.g. "GRADE_*"
+    
+    Parameters
+    ----------
+    patterns : list[str]
+        patterns of item values in original CSV data, matched case-sensitively
+    
+    Returns
+    -------
+    set(int)
+        integer IDs of the items matching any of the patterns
+    """
+    def match(self, patterns):
+        # decode utf-8 like the items
+        patterns = [p.decode('utf-8') if isinstance(p, str) else p for p in patterns]
+        return set(i for item, i in self.item2id.items() 
+                   if any(fnmatchcase(item, p) for p in patterns))
+
+    """renumber the items so that the given ones get the smallest integer IDs, 
+    the other items keep their relative order; data is renumbered in place
+    
+    Parameters
+    ----------
+    first : list[int]
+        integer IDs of the items to put first, in this order
+    
+    Returns
+    -------
+    dict{int:int}
+        mapping the old integer IDs to the new ones
+    """
+    def renumber(self, first):
+        order = list(first)
+        first = set(first)
+        order += sorted(i for i in self.id2item if i not in first)
+        mapping = dict((old, new) for new, old in enumerate(order, 1))
+        self.id2item = dict((mapping[i], item) for i, item in self.id2item.items())
+        self.item2id = dict((item, i) for i, item in self.id2item.items())
+        self.data = [set(mapping[i] for i in trans) for trans in self.data]
+        return mapping
+
+    """recode the items by their frequency: the items whose support value is 
+    below min_supp, which can never be part of a large itemset, are removed 
+    from data and from the mappings, and the others are renumbered 1, 2, ... 
+    in order of frequency (ties in their current order), so that miners can 
+    rely on the order of the integers as the order of frequency
+    
+    Parameters
+    ----------
+    min_supp : float, optional
+        minimum support value of the items kept, 0 by default
+    order : str, optional
+        'ascending' (least frequent item first) or 'descending' frequency
+    
+    Returns
+    -------
+    dict{int:int}
+        mapping the old integer IDs of the items kept to the new ones
+    """
+    def recode(self, min_supp=0, order='ascending'):
+        if order not in ('ascending', 'descending'):
+            raise ValueError("[ERROR] Invalid order of items: {}".format(order))
+        weights = self.weights or [1] * len(self.data)
+        total = sum(weights)
+        counts = dict((i, 0) for i in self.id2item)
+        for weight, trans in zip(weights, self.data):
+            for i in trans:
+                counts[i] += weight
+        is_large = large_test(total, min_supp)
+        kept = [i for i in sorted(counts) if total and is_large(counts[i])]
+        sign = 1 if order == 'ascending' else -1
+        kept.sort(key=lambda i: sign * counts[i])
+        dropped = set(counts) - set(kept)
+        if dropped:
+            # emptied rows are kept, they still count in the support values
+            self.data = [trans - dropped for trans in self.data]
+            for i in dropped:
+                del self.item2id[self.id2item.pop(i)]
+        mapping = self.renumber(kept)
+        self.maxid = len(kept)
+        if __debug__:
+            print "Items recoded: {} kept, {} dropped".format(len(kept), len(dropped))
+        return mapping
+
     """maps a list of integers to their corresponding items in original CSV
     
     Parameters
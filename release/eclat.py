@@ -0,0 +1,107 @@
+from collections import defaultdict
+from apriori import large_test
+
+"""build the transaction-ID list (tidset) of every item in the data
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+
+Returns
+-------
+dict{int:set(int)}
+    key-value pairs of items and the IDs of the transactions containing them
+"""
+def build_tidsets(data):
+    tidsets = defaultdict(set)
+    for tid, trans in enumerate(data):
+        for item in trans:
+            tidsets[item].add(tid)
+    return tidsets
+
+"""extend the itemsets of one equivalence class depth-first
+Reference: Fast Vertical Mining Using Diffsets by Zaki and Gouda
+An equivalence class holds the itemsets sharing the same prefix, each one
+represented by its last item, its count and either its tidset, or its
+diffset (the tids of the prefix NOT containing the itemset). Itemset
+prefix + [xi, xj] is counted from the two members xi and xj:
+- tidsets: t(P xi xj) = t(P xi) & t(P xj), count = |t(P xi xj)|
+- diffsets: d(P xi xj) = d(P xj) - d(P xi), count = c(P xi) - |d(P xi xj)|
+A class of tidsets switches to diffsets as soon as they are smaller, which
+happens quickly on dense data. Only the classes on the current search path
+are kept in memory.
+
+Parameters
+----------
+prefix : tuple(int)
+    the common prefix of the itemsets in the class
+members : list[tuple(int, set(int), int)]
+    item, tidset or diffset, and count of each itemset in the class
+diffsets : boolean
+    True if members hold diffsets, False if they hold tidsets
+is_large : function(int) -> boolean
+    tells if an itemset with the given count is "large"
+total : int
+    total number of transactions, used for computing support values
+itemsets: dict{tuple(int):float}
+    containing final results: large itemsets and their support values
+"""
+def eclat_extend(prefix, members, diffsets, is_large, total, itemsets):
+    for i, (xi, si, ci) in enumerate(members):
+        itemset = prefix + (xi,)
+        itemsets[tuple(sorted(itemset))] = float(ci) / total
+        children = []
+        for xj, sj, cj in members[i+1:]:
+            if diffsets:
+                s = sj - si
+                count = ci - len(s)
+            else:
+                s = si & sj
+                count = len(s)
+            if is_large(count):
+                children.append((xj, s, count))
+        if not children:
+            continue
+        child_diffsets = diffsets
+        if not diffsets and sum(ci - c for _, _, c in children) < sum(c for _, _, c in children):
+            # diffsets of the child class are smaller than its tidsets
+            children = [(xj, si - s, c) for xj, s, c in children]
+            child_diffsets = True
+        eclat_extend(itemset, children, child_diffsets, is_large, total, itemsets)
+
+"""generate large(frequent) itemsets using the (d)Eclat algorithm
+Reference: Fast Vertical Mining Using Diffsets by Zaki and Gouda
+(http://www.cs.rpi.edu/~zaki/PaperDir/SIGKDD03-diff.pdf)
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+min_supp: float
+    minimum support value for an itemset to be "large"
+
+Returns
+-------
+itemsets : dict{tuple(int):float}
+    key-value pairs of large itemsets (tuple of integers) and their support
+    value in the data, same as itemsets_apriori()
+"""
+def itemsets_eclat(data, min_supp):
+    total = len(data)
+    itemsets = {}
+    if not total:
+        return itemsets
+    is_large = large_test(total, min_supp)
+    if __debug__:
+        print "Building tidsets of {} transactions".format(total)
+    members = [(item, tids, len(tids)) for item, tids in build_tidsets(data).items()
+               if is_large(len(tids))]
+    # extending items in ascending order of support keeps the classes small
+    members.sort(key=lambda m: (m[2], m[0]))
+    if __debug__:
+        print "1-item itemsets extracted: {}".format(len(members))
+    eclat_extend((), members, False, is_large, total, itemsets)
+    if __debug__:
+        print "Large itemsets extracted: {}".format(len(itemsets))
+    return itemsets
@@ -0,0 +1,143 @@
+from collections import defaultdict
+from apriori import large_test
+
+class FPNode(object):
+    """
+    Node of a frequent-pattern tree (FP-tree). Each node stands for an item
+    on a path of the tree, shared by all transactions with the same prefix.
+
+    ...
+
+    Attributes
+    ----------
+    item : int
+        the item of the node, None for the root
+    count : int
+        number of transactions whose path goes through the node
+    parent : FPNode
+        parent node, None for the root
+    children : dict{int:FPNode}
+        child nodes indexed by their items
+    """
+    __slots__ = ('item', 'count', 'parent', 'children')
+
+    def __init__(self, item, count, parent):
+        self.item = item
+        self.count = count
+        self.parent = parent
+        self.children = {}
+
+"""build an FP-tree out of (weighted) transactions in two passes
+Reference: Mining Frequent Patterns without Candidate Generation by Han et al.
+The first pass counts the items, the second one inserts the large items of
+each transaction in descending order of their counts, so that transactions
+share the paths of their common frequent prefixes.
+
+Parameters
+----------
+paths : list[tuple(list[int], int)]
+    transactions and the number of times they appear
+is_large : function(int) -> boolean
+    tells if an itemset with the given count is "large"
+
+Returns
+-------
+header : dict{int:list[FPNode]}
+    nodes of each large item in the tree (the "node-links")
+counts : dict{int:int}
+    count of each large item
+"""
+def build_fptree(paths, is_large):
+    counts = defaultdict(int)
+    for items, count in paths:
+        for item in items:
+            counts[item] += count
+    counts = dict((item, count) for item, count in counts.items() if is_large(count))
+    # rank large items by descending count, ties broken by item
+    rank = dict((item, i) for i, item in
+                enumerate(sorted(counts, key=lambda item: (-counts[item], item))))
+
+    root = FPNode(None, 0, None)
+    header = defaultdict(list)
+    for items, count in paths:
+        node = root
+        for item in sorted((i for i in items if i in rank), key=rank.get):
+            child = node.children.get(item)
+            if child is None:
+                child = node.children[item] = FPNode(item, 0, node)
+                header[item].append(child)
+            child.count += count
+            node = child
+    return header, counts
+
+"""mine large itemsets from an FP-tree, without candidate generation
+Each large item of the tree is appended to the suffix itemset, then its
+conditional pattern base (the prefix paths leading to the item) is turned
+into a conditional FP-tree and mined recursively.
+
+Parameters
+----------
+header : dict{int:list[FPNode]}
+    node-links of the tree, see build_fptree()
+counts : dict{int:int}
+    count of each large item in the tree
+suffix : tuple(int)
+    itemset that the tree is conditioned on
+is_large : function(int) -> boolean
+    tells if an itemset with the given count is "large"
+total : int
+    total number of transactions, used for computing support values
+itemsets: dict{tuple(int):float}
+    containing final results: large itemsets and their support values
+"""
+def mine_fptree(header, counts, suffix, is_large, total, itemsets):
+    # bottom-up, i.e. from the least frequent item
+    for item in sorted(counts, key=lambda item: (counts[item], item)):
+        itemset = suffix + (item,)
+        itemsets[tuple(sorted(itemset))] = float(counts[item]) / total
+        paths = []
+        for node in header[item]:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                paths.append((path, node.count))
+        if paths:
+            cond_header, cond_counts = build_fptree(paths, is_large)
+            if cond_counts:
+                mine_fptree(cond_header, cond_counts, itemset, is_large, total, itemsets)
+
+"""generate large(frequent) itemsets using the FP-Growth algorithm
+Reference: Mining Frequent Patterns without Candidate Generation by Han et al.
+(https://www.cs.sfu.ca/~jpei/publications/sigmod00.pdf)
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+min_supp: float
+    minimum support value for an itemset to be "large"
+
+Returns
+-------
+itemsets : dict{tuple(int):float}
+    key-value pairs of large itemsets (tuple of integers) and their support
+    value in the data, same as itemsets_apriori()
+"""
+def itemsets_fpgrowth(data, min_supp):
+    total = len(data)
+    if __debug__:
+        print "Building FP-tree of {} transactions".format(total)
+    itemsets = {}
+    if not total:
+        return itemsets
+    is_large = large_test(total, min_supp)
+    header, counts = build_fptree([(trans, 1) for trans in data], is_large)
+    if __debug__:
+        print "FP-tree nodes: {}".format(sum(len(nodes) for nodes in header.values()))
+    mine_fptree(header, counts, (), is_large, total, itemsets)
+    if __debug__:
+        print "Large itemsets extracted: {}".format(len(itemsets))
+    return itemsets
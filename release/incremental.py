@@ -0,0 +1,145 @@
+import json
+from itemstore import ItemsetTrie
+from apriori import apriori_gen, large_test
+
+# itemsets not large in the old data are only counted there if they are
+# large in the new rows, compared with a slightly lower support value so
+# that rounding errors can never drop a large itemset
+FUP_SUPP_SLACK = 1e-9
+
+"""save large itemsets with their raw counts, for a later incremental update
+The itemsets are saved as lists of item values of the original CSV, not as
+integer IDs, which depend on the order of the rows read.
+
+Parameters
+----------
+filename : str
+    name of the JSON file written
+itemsets : dict{tuple(int):float}
+    all large itemsets and their support values, as returned by
+    itemsets_apriori()
+total : int
+    total number of transactions the support values were computed on
+min_supp: float
+    minimum support value the itemsets were mined with
+csvdata : CSVData
+    data mapping the integer IDs of itemsets to item values
+"""
+def save_counts(filename, itemsets, total, min_supp, csvdata):
+    counts = [[list(csvdata.id2item[item] for item in itemset), int(round(supp * total))]
+              for itemset, supp in sorted(itemsets.items())]
+    with open(filename, 'w') as outfile:
+        json.dump({'total': total, 'min_supp': min_supp, 'itemsets': counts}, outfile)
+
+"""load large itemsets and their raw counts saved by save_counts()
+
+Parameters
+----------
+filename : str
+    name of the JSON file read
+csvdata : CSVData
+    data mapping item values to integer IDs, items it does not know yet are
+    assigned new IDs
+
+Returns
+-------
+counts : dict{tuple(int):int}
+    key-value pairs of large itemsets and their number of occurrences
+total : int
+    total number of transactions the itemsets were counted on
+min_supp: float
+    minimum support value the itemsets were mined with
+"""
+def load_counts(filename, csvdata):
+    with open(filename, 'r') as infile:
+        saved = json.load(infile)
+    counts = {}
+    for items, count in saved['itemsets']:
+        counts[tuple(sorted(csvdata.item_id(item) for item in items))] = count
+    return counts, saved['total'], saved['min_supp']
+
+"""update the large itemsets of old data with appended transactions
+Reference: Maintenance of Discovered Association Rules in Large Databases:
+An Incremental Updating Technique by Cheung, Han, Ng and Wong
+Level by level, the candidates generated from the updated large itemsets
+are counted in the new rows only. A candidate large in the old data is
+still large if its old count plus its new count is large. A candidate
+small in the old data can only become large if it is large in the new
+rows; only those are counted in the old data, in one pass per level, and
+no pass at all is made when there is none.
+
+Parameters
+----------
+counts : dict{tuple(int):int}
+    all large itemsets of the old data and their number of occurrences, see
+    load_counts()
+old_total : int
+    number of transactions of the old data
+data : list[set(int)]
+    list of new transactions, each transaction is a set of integer items
+min_supp: float
+    minimum support value for an itemset to be "large", at least the value
+    counts were mined with
+history : function() -> iterable of set(int), optional
+    returns the transactions of the old data, only called for the itemsets
+    which become large
+
+Returns
+-------
+itemsets : ItemsetTrie
+    large itemsets of the old and new data with their number of occurrences,
+    read as key-value pairs of itemsets and their support value, same as
+    itemsets_apriori() on all the transactions
+"""
+def itemsets_fup(counts, old_total, data, min_supp, history=None):
+    total = old_total + len(data)
+    itemsets = ItemsetTrie(total)
+    if not total:
+        return itemsets
+    is_large = large_test(total, min_supp)
+    new_floor = len(data) * min_supp * (1 - FUP_SUPP_SLACK)
+
+    # level 1: every item of the new rows or large in the old data
+    candidates = set(itemset for itemset in counts if len(itemset) == 1)
+    candidates.update((item,) for trans in data for item in trans)
+    if __debug__:
+        dbg_rescans = 0
+    k = 1
+    while candidates:
+        # count the candidates in the new rows
+        new_counts = ItemsetTrie(len(data))
+        for itemset in candidates:
+            new_counts.add(itemset, 0)
+        for trans in data:
+            new_counts.increment_subsets(sorted(trans))
+        # candidates small in the old data need their old counts
+        rescan = ItemsetTrie(old_total)
+        for itemset in candidates:
+            if itemset not in counts and new_counts.count(itemset) > new_floor:
+                rescan.add(itemset, 0)
+        if len(rescan):
+            if history is None:
+                raise ValueError("[ERROR] Old transactions needed for {} itemsets".format(len(rescan)))
+            for trans in history():
+                rescan.increment_subsets(sorted(trans))
+            if __debug__:
+                dbg_rescans += 1
+        level = []
+        for itemset in candidates:
+            old_count = counts.get(itemset)
+            if old_count is None:
+                old_count = rescan.count(itemset)
+                if old_count is None:
+                    continue
+            count = old_count + new_counts.count(itemset)
+            if is_large(count):
+                itemsets.add(itemset, count)
+                level.append(itemset)
+        if __debug__:
+            print "{}-item itemsets updated: {}, counted in old data: {}".format(
+                k, len(level), len(rescan))
+        candidates = apriori_gen(level)
+        k += 1
+    if __debug__:
+        print "Large itemsets updated: {}, passes over old data: {}".format(len(itemsets), dbg_rescans)
+    return itemsets
@@ -0,0 +1,172 @@
+from array import array
+from collections import Mapping
+
+class ItemsetTrie(Mapping):
+    """
+    Prefix trie of itemsets and their integer counts. Itemsets sharing a
+    prefix share the nodes of the prefix, e.g. (1,2,3) and (1,2,4) only
+    add one node each to the path of (1,2). The nodes are not objects but
+    positions in four array('l') columns: the item of the node, its count
+    (-1 if the path is only a prefix of other itemsets), its first child
+    and its next sibling (-1 if none), the children of a node being linked
+    in increasing order of item. A node thus takes 32 bytes, where a dict
+    entry of an itemset takes its tuple, its float and its hash slot. The
+    nodes of the first level are also found by item in a dict.
+
+    It is also a read-only view of dict{tuple(int):float}, mapping each
+    itemset to its support value float(count) / total, so that it can be
+    used wherever the itemsets returned by itemsets_apriori() are.
+
+    ...
+
+    Attributes
+    ----------
+    total : int
+        total number of transactions, used for computing support values
+
+    Methods
+    -------
+    add(itemset, count)
+        insert itemset (sorted list of int) with its number of occurrences
+    count(itemset)
+        number of occurrences of itemset, None if it is not in the trie
+    contains_subsets(candidate)
+        True if all the (k-1)-subsets of the k-itemset candidate are in the trie
+    increment_subsets(items, weight=1)
+        add weight to the count of every itemset of the trie contained in items
+    """
+    def __init__(self, total):
+        self.total = total
+        self.__items = array('l')
+        self.__counts = array('l')
+        self.__children = array('l')
+        self.__siblings = array('l')
+        self.__top = {}
+        self.__size = 0
+
+    def __child(self, node, item):
+        # child of node holding item, -1 if none
+        items, siblings = self.__items, self.__siblings
+        child = self.__children[node]
+        while child >= 0 and items[child] < item:
+            child = siblings[child]
+        return child if child >= 0 and items[child] == item else -1
+
+    def __new_node(self, item, sibling):
+        self.__items.append(item)
+        self.__counts.append(-1)
+        self.__children.append(-1)
+        self.__siblings.append(sibling)
+        return len(self.__items) - 1
+
+    def add(self, itemset, count):
+        items, children, siblings = self.__items, self.__children, self.__siblings
+        node = self.__top.get(itemset[0])
+        if node is None:
+            node = self.__top[itemset[0]] = self.__new_node(itemset[0], -1)
+        for item in itemset[1:]:
+            # insert the child in order, after its last smaller sibling
+            previous, child = -1, children[node]
+            while child >= 0 and items[child] < item:
+                previous, child = child, siblings[child]
+            if child < 0 or items[child] != item:
+                child = self.__new_node(item, child)
+                if previous < 0:
+                    children[node] = child
+                else:
+                    siblings[previous] = child
+            node = child
+        if self.__counts[node] < 0:
+            self.__size += 1
+        self.__counts[node] = count
+
+    def __node(self, itemset, skip=-1):
+        # walk the path of itemset, without the item at index skip
+        node = -1
+        for i, item in enumerate(itemset):
+            if i == skip:
+                continue
+            node = self.__top.get(item, -1) if node < 0 else self.__child(node, item)
+            if node < 0:
+                return -1
+        return node
+
+    def count(self, itemset):
+        node = self.__node(itemset)
+        if node < 0 or self.__counts[node] < 0:
+            return None
+        return self.__counts[node]
+
+    def contains_subsets(self, candidate):
+        counts = self.__counts
+        for i in xrange(len(candidate)):
+            node = self.__node(candidate, i)
+            if node < 0 or counts[node] < 0:
+                return False
+        return True
+
+    def increment_subsets(self, items, weight=1):
+        # items must be sorted; only the paths made of items are visited,
+        # so the cost depends on the itemsets contained, not on the trie size
+        nitems, counts = self.__items, self.__counts
+        children, siblings = self.__children, self.__siblings
+        n = len(items)
+        stack = []
+        for i in xrange(n):
+            node = self.__top.get(items[i])
+            if node is not None:
+                if counts[node] >= 0:
+                    counts[node] += weight
+                if children[node] >= 0:
+                    stack.append((children[node], i + 1))
+        while stack:
+            # merge the sorted siblings with the rest of items
+            child, i = stack.pop()
+            while child >= 0 and i < n:
+                item = nitems[child]
+                if item < items[i]:
+                    child = siblings[child]
+                elif item > items[i]:
+                    i += 1
+                else:
+                    if counts[child] >= 0:
+                        counts[child] += weight
+                    if children[child] >= 0:
+                        stack.append((children[child], i + 1))
+                    child = siblings[child]
+                    i += 1
+
+    def __getitem__(self, itemset):
+        count = self.count(itemset)
+        if count is None:
+            raise KeyError(itemset)
+        return float(count) / self.total
+
+    def __contains__(self, itemset):
+        return self.count(itemset) is not None
+
+    def __len__(self):
+        return self.__size
+
+    def iteritems(self):
+        # depth-first, itemsets come in sorted order
+        items, counts = self.__items, self.__counts
+        children, siblings = self.__children, self.__siblings
+        total = float(self.total)
+        stack = [((), self.__top[item]) for item in sorted(self.__top, reverse=True)]
+        while stack:
+            prefix, node = stack.pop()
+            itemset = prefix + (items[node],)
+            if counts[node] >= 0:
+                yield itemset, counts[node] / total
+            if siblings[node] >= 0:
+                stack.append((prefix, siblings[node]))
+            if children[node] >= 0:
+                stack.append((itemset, children[node]))
+
+    def __iter__(self):
+        for itemset, _ in self.iteritems():
+            yield itemset
+
+    def items(self):
+        return list(self.iteritems())
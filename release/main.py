@@ -3,8 +3,18 @@
 import argparse
 import os.path
 from data import *
-from apriori import itemsets_apriori
-from rules import association_rules
+from apriori import itemsets_apriori, itemsets_topk, COUNTERS
+from vectorized import NumpyCounter
+from fpgrowth import itemsets_fpgrowth
+from eclat import itemsets_eclat
+from partition import itemsets_partition
+from sampling import itemsets_sampling
+from closed import itemsets_closed, itemsets_maximal
+from incremental import itemsets_fup, save_counts, load_counts
+from streaming import LossyCounter
+from constraints import push_constraints, lhs_supports
+from rules import association_rules, RuleSet
+from ruleindex import RuleIndex, save_index
 
 
 """main function
@@ -16,8 +26,89 @@ min_supp : float
     minimum support value
 min_conf : float
     minimum confidence value
+algorithm : str
+    algorithm generating the large itemsets, 'apriori', 'fpgrowth' or 'eclat'
+counting : str
+    counting backend used by the Apriori algorithm
+chunk_rows : int
+    number of transactions per chunk of the numpy counting backend, 
+    the whole data is counted at once if not given
+workers : int
+    number of worker processes, more than 1 runs the Apriori algorithm on 
+    partitions of the data in parallel
+trim : boolean
+    trim the transactions between the levels of the Apriori algorithm
+trie : boolean
+    store the itemsets of the Apriori algorithm in a prefix trie
+triangular : boolean
+    count the 2-itemsets of the Apriori algorithm in a triangular matrix
+dhp_buckets : int
+    number of hash buckets used to discard 2-candidates of the Apriori 
+    algorithm, 0 to disable
+sample : int
+    size of the random sample mined first by the sampling algorithm, which 
+    is not used if not given
+sample_supp : float
+    support value mining the sample, lowered from min_supp if not given
+seed : int
+    seed of the random sample
+mode : str
+    'all' large itemsets, or only the 'closed' or 'maximal' ones
+top_k : int
+    number of most frequent itemsets generated instead of all the large 
+    ones, min_supp is then only a lower bound on their support
+min_size : int
+    minimum number of items of the top-k itemsets
+counts : str
+    name of the file the large itemsets and their counts are saved to, for 
+    a later incremental update
+update : str
+    name of a file saved with counts, the large itemsets of which are updated 
+    with the rows of csvname instead of mining them from scratch
+history : str
+    name of the CSV file of the rows the update file was counted on, only 
+    read for the itemsets which become large
+stream : float
+    maximum error of the approximate supports computed by streaming the rows 
+    of csvname through Lossy Counting, instead of loading them all
+max_len : int
+    maximum number of items of the streamed itemsets
+require : list[str]
+    patterns of items (e.g. "GRADE_*"), the itemsets mined must contain an 
+    item matching one of them
+exclude : list[str]
+    patterns of items the itemsets mined may not contain
+rhs_prefix : list[str]
+    prefixes of the items allowed in the RHS of the rules, the itemsets 
+    mined must contain one of them unless require is given
+dedup : boolean
+    store identical rows once, with their number of occurrences as weight
+recode : str
+    renumber the items in 'ascending' or 'descending' order of frequency, 
+    dropping the items below min_supp, before mining; not done if not given
+checkpoint : str
+    name of the file the state of the Apriori algorithm is saved to after 
+    each level
+resume : boolean
+    continue the Apriori algorithm from the last level saved in checkpoint
+max_rhs : int
+    maximum number of items in RHS of the rules
+min_lift : float
+    minimal lift value of the rules
+min_leverage : float
+    minimal leverage value of the rules
+min_conviction : float
+    minimal conviction value of the rules
+index : str
+    name of the file the index of the rules is saved to, see ruleindex.py
 """
-def main(csvname, min_supp, min_conf):
+def main(csvname, min_supp, min_conf, algorithm='apriori', counting='scan', chunk_rows=None, 
+         workers=1, trim=False, trie=False, triangular=False, dhp_buckets=0, sample=None, 
+         sample_supp=None, seed=None, mode='all', top_k=None, min_size=1, 
+         counts=None, update=None, history=None, stream=None, max_len=3, 
+         require=None, exclude=None, rhs_prefix=None, dedup=False, 
+         recode=None, checkpoint=None, resume=False, max_rhs=1, min_lift=None, 
+         min_leverage=None, min_conviction=None, index=None):
     # validate inputs
     if not csvname or not os.path.isfile(csvname):
         raise ValueError("[ERROR] Invalid CSV file: {}".format(csvname))
@@ -25,6 +116,61 @@ def main(csvname, min_supp, min_conf):
         raise ValueError("[ERROR] Invalid support value: {}".format(min_supp))
     if not 0 <= min_conf <= 1:
         raise ValueError("[ERROR] Invalid confidence value: {}".format(min_conf))
+    if chunk_rows is not None and counting != 'numpy':
+        raise ValueError("[ERROR] Chunked counting requires the numpy counting method")
+    if dhp_buckets < 0:
+        raise ValueError("[ERROR] Invalid number of hash buckets: {}".format(dhp_buckets))
+    if workers < 1:
+        raise ValueError("[ERROR] Invalid number of workers: {}".format(workers))
+    if workers > 1 and (algorithm != 'apriori' or chunk_rows is not None):
+        raise ValueError("[ERROR] Multiple workers require the apriori algorithm without chunks")
+    if sample is not None and (algorithm != 'apriori' or workers > 1 or sample <= 0):
+        raise ValueError("[ERROR] Invalid sample size or options: {}".format(sample))
+    if mode != 'all' and (algorithm != 'apriori' or workers > 1 or sample is not None):
+        raise ValueError("[ERROR] Closed and maximal itemsets have their own algorithms")
+    if top_k is not None and (top_k <= 0 or min_size <= 0):
+        raise ValueError("[ERROR] Invalid number or size of top itemsets: {}, {}".format(top_k, min_size))
+    if top_k is not None and (algorithm != 'apriori' or workers > 1 or sample is not None 
+                              or mode != 'all'):
+        raise ValueError("[ERROR] Top-k itemsets have their own algorithm")
+    if update is not None and not os.path.isfile(update):
+        raise ValueError("[ERROR] Invalid counts file: {}".format(update))
+    if history is not None and (update is None or not os.path.isfile(history)):
+        raise ValueError("[ERROR] Invalid history CSV file: {}".format(history))
+    if update is not None and (algorithm != 'apriori' or workers > 1 or sample is not None):
+        raise ValueError("[ERROR] Incremental updates have their own algorithm")
+    if (update is not None or counts is not None) and (mode != 'all' or top_k is not None):
+        raise ValueError("[ERROR] Incremental updates require all the large itemsets")
+    if stream is not None and (not 0 < stream < 1 or max_len <= 0):
+        raise ValueError("[ERROR] Invalid support error or itemset length: {}, {}".format(stream, max_len))
+    if stream is not None and (algorithm != 'apriori' or workers > 1 or sample is not None 
+                               or mode != 'all' or top_k is not None or update is not None 
+                               or counts is not None):
+        raise ValueError("[ERROR] Streamed itemsets have their own algorithm")
+    constrained = bool(require or exclude or rhs_prefix)
+    if constrained and (algorithm != 'apriori' or workers > 1 or sample is not None 
+                        or mode != 'all' or top_k is not None or update is not None 
+                        or counts is not None or stream is not None):
+        raise ValueError("[ERROR] Item constraints require the apriori algorithm")
+    if dedup and (algorithm != 'apriori' or workers > 1 or sample is not None or mode != 'all' 
+                  or update is not None or stream is not None):
+        raise ValueError("[ERROR] Weighted rows are only counted by the apriori algorithm")
+    if recode is not None and (update is not None or stream is not None):
+        raise ValueError("[ERROR] Incremental and streamed rows cannot be recoded")
+    if resume and checkpoint is None:
+        raise ValueError("[ERROR] Resuming requires a checkpoint file")
+    if checkpoint is not None and (algorithm != 'apriori' or workers > 1 or sample is not None 
+                                   or mode != 'all' or top_k is not None or update is not None 
+                                   or stream is not None):
+        raise ValueError("[ERROR] Checkpoints are only written by the apriori algorithm")
+    if max_rhs < 1:
+        raise ValueError("[ERROR] Invalid number of items in RHS: {}".format(max_rhs))
+    if min_lift is not None and min_lift < 0:
+        raise ValueError("[ERROR] Invalid lift value: {}".format(min_lift))
+    if min_leverage is not None and not -1 <= min_leverage <= 1:
+        raise ValueError("[ERROR] Invalid leverage value: {}".format(min_leverage))
+    if min_conviction is not None and min_conviction < 0:
+        raise ValueError("[ERROR] Invalid conviction value: {}".format(min_conviction))
 
     if __debug__:
         print "====== ASSOCIATION RULES (DEBUG MODE) ======"
@@ -33,33 +179,142 @@ def main(csvname, min_supp, min_conf):
     print "Input CSV file ----- {}".format(csvname)
     print "Minimum Support ---- {}".format(min_supp)
     print "Minimum Confidence - {}".format(min_conf)
+    print "Algorithm ---------- {}".format(algorithm)
+    if algorithm == 'apriori':
+        print "Counting method ---- {}".format(counting)
+        print "Workers ------------ {}".format(workers)
+    if top_k is not None:
+        print "Top-k itemsets ----- {} (min size {})".format(top_k, min_size)
+    if update is not None:
+        print "Updated counts ----- {}".format(update)
+    if stream is not None:
+        print "Streaming error ---- {} (max length {})".format(stream, max_len)
+    if constrained:
+        print "Required items ----- {}".format(", ".join(require or []))
+        print "Excluded items ----- {}".format(", ".join(exclude or []))
+        print "RHS prefixes ------- {}".format(", ".join(rhs_prefix or []))
+    if max_rhs > 1:
+        print "Items in RHS ------- up to {}".format(max_rhs)
+    if min_lift is not None:
+        print "Minimum Lift ------- {}".format(min_lift)
+    if min_leverage is not None:
+        print "Minimum Leverage --- {}".format(min_leverage)
+    if min_conviction is not None:
+        print "Minimum Conviction - {}".format(min_conviction)
+    if index is not None:
+        print "Rule index file ---- {}".format(index)
+    if checkpoint is not None:
+        print "Checkpoint file ---- {}{}".format(checkpoint, " (resumed)" if resume else "")
 
     # save and index CSV data
     print "\nParsing CSV data..."
-    csvdata = CSVData(csvname)
+    # streamed rows are only read while generating the itemsets
+    csvdata = CSVData(None if stream is not None else csvname, dedup)
+    if recode is not None:
+        csvdata.recode(min_supp, recode)
     data = csvdata.data
+    weights = csvdata.weights
+    total = len(data) if weights is None else sum(weights)
+    if update is not None:
+        old_counts, old_total, old_supp = load_counts(update, csvdata)
+        if min_supp < old_supp:
+            raise ValueError("[ERROR] Support value lower than the counts file: {}".format(old_supp))
+        total += old_total
+    required = rhs_items = None
+    if constrained:
+        rhs_patterns = [prefix + "*" for prefix in rhs_prefix or []]
+        lead = csvdata.match(require or rhs_patterns)
+        if (require or rhs_prefix) and not lead:
+            raise ValueError("[ERROR] No item matches the required items or RHS prefixes")
+        required = push_constraints(csvdata, lead, csvdata.match(exclude or [])) or None
+        data = csvdata.data
+        if rhs_prefix:
+            rhs_items = csvdata.match(rhs_patterns)
+    counter = counting
+    if chunk_rows is not None:
+        counter = NumpyCounter(data, chunk_rows, weights)
 
     # compute rules and dump output to file
     outname = "output.txt"
     with open(outname, "w") as outfile:
-        # generate large itemsets using the Apriori algorithm
-        print "\nGenerating large itemsets using Apriori algorithm..."
-        itemsets = itemsets_apriori(data, min_supp)
+        # generate large itemsets using the selected algorithm
+        if top_k is not None:
+            print "\nGenerating the %d most frequent itemsets..." % (top_k)
+            itemsets = itemsets_topk(data, top_k, min_size, min_supp, weights)
+        elif stream is not None:
+            print "\nGenerating large itemsets using Lossy Counting..."
+            streamer = LossyCounter(stream, max_len)
+            streamer.consume(csvdata.iter_rows(csvname))
+            itemsets = streamer.itemsets(min_supp)
+        elif update is not None:
+            print "\nUpdating large itemsets using FUP algorithm..."
+            itemsets = itemsets_fup(old_counts, old_total, data, min_supp, 
+                                    history and (lambda: csvdata.iter_rows(history)))
+        elif mode == 'closed':
+            print "\nGenerating closed large itemsets..."
+            itemsets = itemsets_closed(data, min_supp)
+        elif mode == 'maximal':
+            print "\nGenerating maximal large itemsets..."
+            itemsets = itemsets_maximal(data, min_supp)
+        elif algorithm == 'fpgrowth':
+            print "\nGenerating large itemsets using FP-Growth algorithm..."
+            itemsets = itemsets_fpgrowth(data, min_supp)
+        elif algorithm == 'eclat':
+            print "\nGenerating large itemsets using Eclat algorithm..."
+            itemsets = itemsets_eclat(data, min_supp)
+        elif workers > 1:
+            print "\nGenerating large itemsets using Partition algorithm..."
+            itemsets = itemsets_partition(data, min_supp, workers, counting)
+        elif sample is not None:
+            print "\nGenerating large itemsets using Sampling algorithm..."
+            misses = []
+            itemsets = itemsets_sampling(data, min_supp, sample, sample_supp, seed, counting, 
+                                         misses=misses)
+            if misses:
+                print "Sample missed %d itemsets, mined the whole data." % (len(misses))
+        else:
+            print "\nGenerating large itemsets using Apriori algorithm..."
+            itemsets = itemsets_apriori(data, min_supp, counter, trim, trie, triangular, 
+                                        dhp_buckets, required, weights, checkpoint, resume)
         # print and dump to file the large(frequent) itemsets
-        outfile.write("==Frequent itemsets (min_supp=%.2f%%)\n" % (min_supp * 100))
-        for itemset, supp in sorted(itemsets.items(), key=lambda x:x[1], reverse=True):
+        if top_k is not None:
+            outfile.write("==Top %d frequent itemsets (min_size=%d)\n" % (top_k, min_size))
+        elif getattr(itemsets, 'approximate', False):
+            outfile.write("==Frequent itemsets (min_supp=%.2f%%, approximate supports, "
+                          "error<=%.2f%%)\n" % (min_supp * 100, itemsets.epsilon * 100))
+        else:
+            outfile.write("==Frequent %sitemsets (min_supp=%.2f%%)\n" % (
+                "" if mode == 'all' else mode + " ", min_supp * 100))
+        # itemsets with the same support are listed in order of their items, so 
+        # that the output does not depend on the algorithm that generated them
+        for itemset, supp in sorted(sorted(itemsets.items()), key=lambda x:x[1], reverse=True):
             line = "[ %s ], %.2f%%\n" % (
                 " , ".join([str(item) for item in csvdata.item_list(itemset)]), 
                 supp * 100)
             outfile.write(line)
         print "Found %d larger itemsets." % (len(itemsets))
+        if counts is not None:
+            save_counts(counts, itemsets, total, min_supp, csvdata)
+            print "Saved itemset counts to %s." % (counts)
 
         # generate association rules
         print "\nGenerating association rules..."
-        rules = association_rules(itemsets, min_conf)
+        if mode == 'maximal':
+            # the supports of the subsets of maximal itemsets are unknown
+            print "Not available for maximal itemsets."
+            rules = RuleSet()
+        else:
+            # rules of top-k itemsets are only generated when their LHS are in the top k too
+            supports = None
+            if constrained:
+                # one more pass for the LHS without required items
+                supports = lhs_supports(itemsets, data, rhs_items, weights, max_rhs)
+            rules = association_rules(itemsets, min_conf, mode == 'closed', rhs_items, supports, 
+                                      max_rhs, min_lift, min_leverage, min_conviction)
         # print and dump to file the association rules
         outfile.write("\n\n==High-confidence association rules (min_conf=%.2f%%)\n" % (min_conf * 100))
-        for rule in sorted(rules, key=lambda x:x.attr[2], reverse=True):
+        rules.sort_by('conf', descending=True)
+        for rule in rules:
             lhs, rhs, conf, supp = rule.attr
             line = "[ %s ] => [ %s ] (Conf: %.2f%%, Supp: %.2f%%)\n" % (
                 " , ".join(csvdata.item_list(lhs)), 
@@ -67,6 +322,9 @@ def main(csvname, min_supp, min_conf):
                 conf * 100, supp * 100)
             outfile.write(line)
         print "Found %d association rules." % (len(rules))
+        if index is not None:
+            save_index(index, RuleIndex(rules, csvdata.id2item))
+            print "Saved rule index to %s." % (index)
         print "Refer to %s for detailed outputs. Exiting..." % (outname)
 
 
@@ -77,6 +335,68 @@ if __name__ == '__main__':
     parser.add_argument('csvname', type=str, help='name of the CSV file that contains data')
     parser.add_argument('min_supp', type=float, help='minimal support value (range 0 to 1)')
     parser.add_argument('min_conf', type=float, help='minimal confidence value (range 0 to 1)')
+    parser.add_argument('--algorithm', type=str, default='apriori', choices=['apriori', 'fpgrowth', 'eclat'], 
+                        help='algorithm generating the large itemsets')
+    parser.add_argument('--counting', type=str, default='scan', choices=sorted(COUNTERS), 
+                        help='support counting method of the Apriori algorithm')
+    parser.add_argument('--chunk-rows', type=int, default=None, 
+                        help='count the numpy matrix in chunks of this many transactions')
+    parser.add_argument('--workers', type=int, default=1, 
+                        help='number of processes mining partitions of the data in parallel')
+    parser.add_argument('--trim', action='store_true', 
+                        help='drop useless items and transactions after each Apriori level '
+                             '(bitset and numpy: shorter bitmaps once transactions are dropped)')
+    parser.add_argument('--trie', action='store_true', 
+                        help='store the Apriori itemsets and their counts in a prefix trie')
+    parser.add_argument('--triangular', action='store_true', 
+                        help='count the Apriori 2-itemsets directly in a triangular matrix')
+    parser.add_argument('--dhp-buckets', type=int, default=0, 
+                        help='number of hash buckets filtering the Apriori 2-candidates')
+    parser.add_argument('--sample', type=int, default=None, 
+                        help='mine a random sample of this many transactions first, then verify')
+    parser.add_argument('--sample-supp', type=float, default=None, 
+                        help='lowered support value mining the sample')
+    parser.add_argument('--seed', type=int, default=None, help='seed of the random sample')
+    parser.add_argument('--mode', type=str, default='all', choices=['all', 'closed', 'maximal'], 
+                        help='mine all large itemsets, or only the closed or maximal ones')
+    parser.add_argument('--top-k', type=int, default=None, 
+                        help='mine this many most frequent itemsets, min_supp being a lower bound')
+    parser.add_argument('--min-size', type=int, default=1, 
+                        help='minimum number of items of the top-k itemsets')
+    parser.add_argument('--counts', type=str, default=None, 
+                        help='save the large itemsets and their counts to this file')
+    parser.add_argument('--update', type=str, default=None, 
+                        help='update the itemsets of this counts file with the rows of the CSV')
+    parser.add_argument('--history', type=str, default=None, 
+                        help='CSV file of the rows counted in the updated counts file')
+    parser.add_argument('--stream', type=float, default=None, 
+                        help='stream the rows through Lossy Counting with this support error')
+    parser.add_argument('--max-len', type=int, default=3, 
+                        help='maximum number of items of the streamed itemsets')
+    parser.add_argument('--require', type=str, action='append', 
+                        help='only mine itemsets with an item matching this pattern (repeatable)')
+    parser.add_argument('--exclude', type=str, action='append', 
+                        help='never mine items matching this pattern (repeatable)')
+    parser.add_argument('--rhs-prefix', type=str, action='append', 
+                        help='only generate rules whose RHS starts with this prefix (repeatable)')
+    parser.add_argument('--dedup', action='store_true', 
+                        help='store identical rows once, weighted by their number of occurrences')
+    parser.add_argument('--recode', type=str, default=None, choices=['ascending', 'descending'], 
+                        help='renumber the items by frequency and drop the infrequent ones first')
+    parser.add_argument('--checkpoint', type=str, default=None, 
+                        help='save the state of the Apriori algorithm to this file after each level')
+    parser.add_argument('--resume', action='store_true', 
+                        help='continue from the last level saved in the checkpoint file')
+    parser.add_argument('--max-rhs', type=int, default=1, 
+                        help='maximum number of items in RHS of the rules')
+    parser.add_argument('--min-lift', type=float, default=None, 
+                        help='minimal lift value of the rules')
+    parser.add_argument('--min-leverage', type=float, default=None, 
+                        help='minimal leverage value of the rules (range -1 to 1)')
+    parser.add_argument('--min-conviction', type=float, default=None, 
+                        help='minimal conviction value of the rules')
+    parser.add_argument('--index', type=str, default=None, 
+                        help='save an index of the rules to this file, see ruleindex.py')
 
     args = vars(parser.parse_args())
     main(**args)
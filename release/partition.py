@@ -0,0 +1,121 @@
+import multiprocessing
+from collections import defaultdict
+from apriori import itemsets_apriori, COUNTERS
+
+# locally large itemsets are mined with a slightly lower support value, so
+# that rounding errors can never drop a globally large itemset
+LOCAL_SUPP_SLACK = 1e-9
+
+# transactions shared with the worker processes, which inherit them when
+# the pool is forked instead of receiving a pickled copy
+_data = None
+
+"""mine the locally large itemsets of one partition (runs in a worker)
+
+Parameters
+----------
+args : tuple(int, int, float, str)
+    index of the partition, number of partitions, minimum support value 
+    and counting backend of the Apriori algorithm
+
+Returns
+-------
+list[tuple(int)]
+    locally large itemsets
+"""
+def _mine_partition(args):
+    part, parts, min_supp, counting = args
+    return itemsets_apriori(_data[part::parts], min_supp, counting).keys()
+
+"""count candidate itemsets in one partition (runs in a worker)
+
+Parameters
+----------
+args : tuple(int, int, dict{int:list[list[int]]}, str)
+    index of the partition, number of partitions, candidate itemsets 
+    grouped by size and counting backend
+
+Returns
+-------
+dict{int:list[int]}
+    number of occurrences of each candidate in the partition
+"""
+def _count_partition(args):
+    part, parts, candidates, counting = args
+    counter = COUNTERS[counting](_data[part::parts])
+    return dict((k, counter.count(ksets)) for k, ksets in candidates.items())
+
+"""generate large(frequent) itemsets using the Partition algorithm
+Reference: An Efficient Algorithm for Mining Association Rules in Large
+Databases by Savasere, Omiecinski and Navathe
+Data is split into one partition per worker, transaction i going to
+partition i % workers so that partitions do not depend on the order of
+the rows in the CSV file (e.g. sorted by date). Any large itemset must be
+locally large in at least one partition, so the union of the locally large
+itemsets (mined in parallel) holds all candidates; a second parallel pass
+counts them over all partitions to get their exact support values.
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+min_supp: float
+    minimum support value for an itemset to be "large"
+workers : int
+    number of partitions and worker processes
+counting : str, optional
+    name of the counting backend of the Apriori algorithm mining each 
+    partition and counting the candidates, 'scan' by default
+
+Returns
+-------
+itemsets : dict{tuple(int):float}
+    key-value pairs of large itemsets (tuple of integers) and their support
+    value in the data, same as itemsets_apriori()
+"""
+def itemsets_partition(data, min_supp, workers, counting='scan'):
+    global _data
+    if workers < 1:
+        raise ValueError("[ERROR] Invalid number of workers: {}".format(workers))
+    total = len(data)
+    if not total:
+        return {}
+    parts = min(workers, total)
+
+    _data = data
+    pool = multiprocessing.Pool(parts)
+    try:
+        # phase 1: locally large itemsets of each partition
+        if __debug__:
+            print "Mining {} partitions of {} transactions".format(parts, total // parts)
+        local_supp = min_supp * (1 - LOCAL_SUPP_SLACK)
+        results = pool.map(_mine_partition,
+                           [(part, parts, local_supp, counting) for part in xrange(parts)])
+        candidates = defaultdict(list)
+        for itemset in set().union(*results):
+            candidates[len(itemset)].append(list(itemset))
+        if __debug__:
+            print "Global candidates: {}".format(sum(len(c) for c in candidates.values()))
+
+        # phase 2: global counts of all candidates, which takes one scan per 
+        # candidate with the 'scan' backend, the hash tree does it in one pass; 
+        # the 'tid' and 'hybrid' backends count from the large itemsets of the 
+        # previous level (see update()), which one counter of all sizes lacks
+        if counting in ('scan', 'tid', 'hybrid'):
+            counting = 'hashtree'
+        results = pool.map(_count_partition,
+                           [(part, parts, candidates, counting) for part in xrange(parts)])
+    finally:
+        pool.close()
+        pool.join()
+        _data = None
+
+    itemsets = {}
+    for k, ksets in candidates.items():
+        for i, candidate in enumerate(ksets):
+            supp = float(sum(counts[k][i] for counts in results)) / total
+            if supp >= min_supp:
+                itemsets[tuple(candidate)] = supp
+    if __debug__:
+        print "Large itemsets extracted: {}".format(len(itemsets))
+    return itemsets
@@ -0,0 +1,281 @@
+import zlib
+import marshal
+import argparse
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from fnmatch import fnmatchcase
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from rules import RuleSet
+
+# first bytes of a rule index file, changed with the format
+INDEX_MAGIC = 'RULEIDX1'
+
+class RuleIndex(object):
+    """
+    Inverted index of association rules, answering queries on the items
+    and metrics of the rules without scanning all of them. Each item has
+    two posting lists, the sorted positions of the rules whose LHS
+    (respectively RHS) contains it, and each metric is also stored sorted,
+    with the positions of the rules in that order, so that the rules
+    reaching a threshold are a suffix found by bisection. A query starts
+    from the smallest of these lists and checks the other conditions on
+    its rules only.
+
+    ...
+
+    Attributes
+    ----------
+    rules : RuleSet
+        rules indexed, in the order they were given
+    id2item : dict{int:unicode}
+        mapping an integer ID of the rules to an item in the original CSV data
+    item2id : dict{unicode:int}
+        mapping items in the original CSV to integers
+    postings : tuple(dict{int:array('l')})
+        posting lists of the LHS and of the RHS items
+    columns : dict{str:tuple(array('l'), array('d'))}
+        positions of the rules by ascending value of each metric, and the
+        values in that order
+
+    Methods
+    -------
+    match(pattern)
+        integers of the items matching a shell-style pattern
+    query(lhs=None, rhs=None, items=None, min_conf=None, min_supp=None, min_lift=None,
+          min_leverage=None, min_conviction=None, order_by=None, limit=None)
+        rules matching all the conditions given
+    """
+    def __init__(self, rules, id2item, postings=None, columns=None):
+        self.rules = rules
+        self.id2item = dict(id2item)
+        self.item2id = dict((item, i) for i, item in self.id2item.items())
+        self.postings = self.__build_postings() if postings is None else postings
+        self.columns = self.__build_columns() if columns is None else columns
+
+    def __build_postings(self):
+        # positions are appended in increasing order, so the lists are sorted
+        postings = (defaultdict(lambda: array('l')), defaultdict(lambda: array('l')))
+        rules = self.rules
+        for j in xrange(len(rules)):
+            start, split, end = rules.starts[j], rules.splits[j], rules.ends[j]
+            for side, (a, b) in zip(postings, ((start, split), (split, end))):
+                for item in rules.items[a:b]:
+                    side[item].append(j)
+        return tuple(dict(side) for side in postings)
+
+    def __build_columns(self):
+        # ascending values of each metric, ties in the order of the rules
+        columns = {}
+        for column in RuleSet.METRICS:
+            values = getattr(self.rules, column)
+            if np is None or not len(values):
+                order = array('l', sorted(xrange(len(values)), key=values.__getitem__))
+                ordered = array('d', (values[j] for j in order))
+            else:
+                values = np.frombuffer(values, dtype=values.typecode)
+                positions = np.argsort(values, kind='mergesort')
+                order = array('l', positions.astype(np.dtype('l')).tostring())
+                ordered = array('d', values[positions].tostring())
+            columns[column] = (order, ordered)
+        return columns
+
+    def match(self, pattern):
+        if isinstance(pattern, str):
+            pattern = pattern.decode('utf-8')
+        return [i for item, i in self.item2id.items() if fnmatchcase(item, pattern)]
+
+    def __posting(self, pattern, sides):
+        # sorted positions of the rules with an item matching pattern on any of sides
+        lists = [side[i] for i in self.match(pattern) for side in sides if i in side]
+        if len(lists) == 1:
+            return lists[0]
+        if np is None or not lists:
+            return array('l', sorted(set().union(*lists)))
+        return array('l', np.unique(np.concatenate([as_numpy(a) for a in lists])).tostring())
+
+    def query(self, lhs=None, rhs=None, items=None, min_conf=None, min_supp=None,
+              min_lift=None, min_leverage=None, min_conviction=None, order_by=None,
+              limit=None):
+        # sorted lists of positions, each one a condition on the rules
+        lists = [self.__posting(pattern, sides) for patterns, sides in (
+                     (lhs, self.postings[:1]), (rhs, self.postings[1:]),
+                     (items, self.postings)) for pattern in patterns or []]
+        thresholds = [(column, value) for column, value in zip(RuleSet.METRICS, (
+            min_conf, min_supp, min_lift, min_leverage, min_conviction)) if value is not None]
+        ranges = []
+        for column, value in thresholds:
+            order, ordered = self.columns[column]
+            ranges.append((column, value, order[bisect_left(ordered, value):]))
+
+        # start from the smallest list, the other ones are only looked up
+        sizes = [len(positions) for positions in lists] + [len(r[2]) for r in ranges]
+        if not sizes:
+            selected = xrange(len(self.rules)) if np is None else np.arange(len(self.rules))
+        elif min(sizes) == 0:
+            selected = []
+        else:
+            smallest = sizes.index(min(sizes))
+            if smallest < len(lists):
+                selected = lists.pop(smallest)
+            else:
+                selected = ranges.pop(smallest - len(lists))[2]
+                selected = sorted(selected) if np is None else np.sort(as_numpy(selected))
+            if np is None:
+                for positions in lists:
+                    selected = [j for j in selected if contains(positions, j)]
+                for column, value, _ in ranges:
+                    values = getattr(self.rules, column)
+                    selected = [j for j in selected if values[j] >= value]
+            else:
+                selected = as_numpy(selected)
+                for positions in lists:
+                    positions = as_numpy(positions)
+                    found = np.searchsorted(positions, selected)
+                    found[found == len(positions)] = 0
+                    selected = selected[positions[found] == selected]
+                for column, value, _ in ranges:
+                    selected = selected[as_numpy(getattr(self.rules, column))[selected] >= value]
+
+        res = self.rules.take(selected)
+        if order_by is not None:
+            res.sort_by(order_by, descending=True)
+        if limit is not None:
+            res = res[:limit]
+        return res
+
+"""check whether a sorted array holds a value, by bisection
+
+Parameters
+----------
+positions : array('l')
+    sorted positions
+j : int
+    position looked up
+
+Returns
+-------
+boolean
+"""
+def contains(positions, j):
+    n = bisect_left(positions, j)
+    return n < len(positions) and positions[n] == j
+
+"""view an array as a NumPy array, without copying it
+
+Parameters
+----------
+values : array
+    array of integers or floats, or NumPy array
+
+Returns
+-------
+numpy.ndarray
+"""
+def as_numpy(values):
+    if isinstance(values, np.ndarray):
+        return values
+    if not len(values):
+        return np.empty(0, dtype=values.typecode)
+    return np.frombuffer(values, dtype=values.typecode)
+
+"""write a rule index, with the vocabulary of its items
+The rules, posting lists and sorted metrics are stored as arrays of
+integers and floats, the posting lists of one side of the rules as the
+items, the offsets of their lists and the lists one after the other; the
+whole is compressed with zlib.
+
+Parameters
+----------
+filename : str
+    name of the index file
+index : RuleIndex
+    index written
+"""
+def save_index(filename, index):
+    rules = index.rules
+    postings = []
+    for side in index.postings:
+        keys = array('l', sorted(side))
+        offsets, positions = array('l', [0]), array('l')
+        for item in keys:
+            positions.extend(side[item])
+            offsets.append(len(positions))
+        postings.append((keys.tostring(), offsets.tostring(), positions.tostring()))
+    columns = dict((column, (order.tostring(), ordered.tostring()))
+                   for column, (order, ordered) in index.columns.items())
+    payload = marshal.dumps((index.id2item,
+        rules.items.tostring(), rules.starts.tostring(), rules.splits.tostring(),
+        rules.ends.tostring(),
+        dict((column, getattr(rules, column).tostring()) for column in RuleSet.METRICS),
+        postings, columns))
+    with open(filename, 'wb') as outfile:
+        outfile.write(INDEX_MAGIC)
+        outfile.write(zlib.compress(payload))
+
+"""read a rule index written by save_index()
+
+Parameters
+----------
+filename : str
+    name of the index file
+
+Returns
+-------
+RuleIndex
+"""
+def load_index(filename):
+    with open(filename, 'rb') as infile:
+        if infile.read(len(INDEX_MAGIC)) != INDEX_MAGIC:
+            raise ValueError("[ERROR] Invalid rule index file: {}".format(filename))
+        id2item, items, starts, splits, ends, metrics, postings, columns = marshal.loads(
+            zlib.decompress(infile.read()))
+    rules = RuleSet(array('l', items))
+    rules.starts, rules.splits, rules.ends = (array('l', a) for a in (starts, splits, ends))
+    for column in RuleSet.METRICS:
+        setattr(rules, column, array('d', metrics[column]))
+    sides = []
+    for keys, offsets, positions in postings:
+        keys, offsets, positions = (array('l', a) for a in (keys, offsets, positions))
+        sides.append(dict((item, positions[offsets[n]:offsets[n + 1]])
+                          for n, item in enumerate(keys)))
+    columns = dict((column, (array('l', order), array('d', ordered)))
+                   for column, (order, ordered) in columns.items())
+    return RuleIndex(rules, id2item, tuple(sides), columns)
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query an index of association rules')
+    parser.add_argument('index', type=str, help='name of the rule index file (see main.py --index)')
+    parser.add_argument('--lhs', type=str, action='append',
+                        help='only rules whose LHS has an item matching this pattern (repeatable)')
+    parser.add_argument('--rhs', type=str, action='append',
+                        help='only rules whose RHS has an item matching this pattern (repeatable)')
+    parser.add_argument('--item', type=str, action='append', dest='items',
+                        help='only rules with an item matching this pattern (repeatable)')
+    parser.add_argument('--min-conf', type=float, default=None, help='minimal confidence value')
+    parser.add_argument('--min-supp', type=float, default=None, help='minimal support value')
+    parser.add_argument('--min-lift', type=float, default=None, help='minimal lift value')
+    parser.add_argument('--min-leverage', type=float, default=None, help='minimal leverage value')
+    parser.add_argument('--min-conviction', type=float, default=None,
+                        help='minimal conviction value')
+    parser.add_argument('--order-by', type=str, default=None, choices=RuleSet.METRICS,
+                        help='list the rules by decreasing value of this metric')
+    parser.add_argument('--limit', type=int, default=None, help='maximum number of rules listed')
+
+    args = vars(parser.parse_args())
+    index = load_index(args.pop('index'))
+    rules = index.query(**args)
+    for rule in rules:
+        lhs, rhs, conf, supp = rule.attr
+        lift, leverage, conviction = rule.metrics
+        line = u"[ %s ] => [ %s ] (Conf: %.2f%%, Supp: %.2f%%, Lift: %.2f, Leverage: %.4f, Conviction: %.2f)" % (
+            u" , ".join(index.id2item[i] for i in lhs),
+            u" , ".join(index.id2item[i] for i in rhs),
+            conf * 100, supp * 100, lift, leverage, conviction)
+        print line.encode('utf-8')
+    print "Found %d association rules." % (len(rules))
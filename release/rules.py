@@ -1,3 +1,13 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from array import array
+from itertools import compress
+from collections import Sequence
+from closed import expand_closed
+from apriori import apriori_gen
+
 class AssociationRule(object):
     """
     Association rules: likelihood of RHS items given the LHS items.
@@ -15,12 +25,17 @@ class AssociationRule(object):
     supp : float
         support value of the rule, fraction of transactions that 
         contain all items in both lhs and rhs
+    metrics : tuple(float)
+        lift, leverage and conviction values of the rule, see rule_metrics()
     """
-    def __init__(self, lhs, rhs, conf, supp):
+    def __init__(self, lhs, rhs, conf, supp, lift=None, leverage=None, conviction=None):
         self.__lhs = lhs
         self.__rhs = rhs
         self.__conf = conf
         self.__supp = supp
+        self.__lift = lift
+        self.__leverage = leverage
+        self.__conviction = conviction
 
     def __cmp__(self, other):
         r = cmp(len(self.__rhs), len(other.__rhs))
@@ -42,7 +57,227 @@ class AssociationRule(object):
     def attr(self):
         return (self.__lhs, self.__rhs, self.__conf, self.__supp)
 
-"""generate rules out of one itemset (support only single item in RHS)
+    @property
+    def metrics(self):
+        return (self.__lift, self.__leverage, self.__conviction)
+
+class RuleSet(Sequence):
+    """
+    Columnar store of association rules. The items of all the LHS and RHS
+    are stored one after the other in one shared buffer, each rule being 
+    the offsets of its LHS start, LHS end (RHS start) and RHS end in the 
+    buffer, and its metrics are stored in one array per metric. Sorting and 
+    filtering only permute or select the offsets and metrics, computing 
+    the order from the key arrays at once (with NumPy if installed), and 
+    the buffer is shared by the rule sets filtered from one another.
+
+    It is also a read-only sequence of AssociationRule, each built on 
+    access from the arrays, so that it can be used wherever the list 
+    returned by association_rules() was.
+
+    ...
+
+    Attributes
+    ----------
+    items : array('l')
+        shared buffer of the LHS and RHS items of the rules
+    starts, splits, ends : array('l')
+        offsets of the LHS start, RHS start and RHS end of each rule in items
+    conf, supp, lift, leverage, conviction : array('d')
+        metric values of each rule, see rule_metrics()
+
+    Methods
+    -------
+    extend(lhss, rhss, conf, supp, lift, leverage, conviction)
+        append rules given by parallel sequences of their LHS, RHS and metrics
+    sort()
+        sort in the order of association_rules()
+    sort_by(column, descending=False)
+        stable sort on the values of one metric
+    filter(min_conf=None, min_supp=None, min_lift=None, min_leverage=None, min_conviction=None)
+        new rule set of the rules reaching all the thresholds given
+    take(selected)
+        new rule set of the rules at the given (int) positions, in this order
+    """
+    METRICS = ('conf', 'supp', 'lift', 'leverage', 'conviction')
+
+    def __init__(self, items=None):
+        self.items = array('l') if items is None else items
+        self.starts, self.splits, self.ends = array('l'), array('l'), array('l')
+        for column in self.METRICS:
+            setattr(self, column, array('d'))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, j):
+        if isinstance(j, slice):
+            indices = j.indices(len(self))
+            return self.take(xrange(*indices) if np is None else np.arange(*indices))
+        if j < 0:
+            j += len(self)
+        if not 0 <= j < len(self):
+            raise IndexError("rule index out of range")
+        start, split, end = self.starts[j], self.splits[j], self.ends[j]
+        return AssociationRule(tuple(self.items[start:split]), self.items[split:end].tolist(), 
+                               self.conf[j], self.supp[j], 
+                               self.lift[j], self.leverage[j], self.conviction[j])
+
+    def extend(self, lhss, rhss, conf, supp, lift, leverage, conviction):
+        items = self.items
+        for lhs, rhs in zip(lhss, rhss):
+            self.starts.append(len(items))
+            items.extend(lhs)
+            self.splits.append(len(items))
+            items.extend(rhs)
+            self.ends.append(len(items))
+        for column, values in zip(self.METRICS, (conf, supp, lift, leverage, conviction)):
+            getattr(self, column).extend(values)
+
+    def sort(self):
+        # same order as AssociationRule.__cmp__, ties kept in place
+        if np is None:
+            starts, splits, ends, conf, supp = (self.starts, self.splits, self.ends, 
+                                                self.conf, self.supp)
+            order = sorted(xrange(len(self)), key=lambda j: (
+                ends[j] - splits[j], splits[j] - starts[j], -conf[j], -supp[j]))
+        else:
+            starts, splits, ends = (self.__column(c) for c in ('starts', 'splits', 'ends'))
+            # lexsort is stable, its last key is the primary one
+            order = np.lexsort((-self.__column('supp'), -self.__column('conf'), 
+                                splits - starts, ends - splits))
+        self.__permute(order)
+
+    def sort_by(self, column, descending=False):
+        if column not in self.METRICS:
+            raise ValueError("[ERROR] Invalid rule metric: {}".format(column))
+        if np is None:
+            # sorted() keeps ties in place even in reverse order
+            values = getattr(self, column)
+            order = sorted(xrange(len(self)), key=values.__getitem__, reverse=descending)
+        else:
+            values = self.__column(column)
+            order = np.argsort(-values if descending else values, kind='mergesort')
+        self.__permute(order)
+
+    def filter(self, min_conf=None, min_supp=None, min_lift=None, min_leverage=None, 
+               min_conviction=None):
+        thresholds = zip(self.METRICS, (min_conf, min_supp, min_lift, min_leverage, min_conviction))
+        thresholds = [(column, value) for column, value in thresholds if value is not None]
+        if np is None:
+            selected = [j for j in xrange(len(self)) 
+                        if all(getattr(self, column)[j] >= value for column, value in thresholds)]
+        else:
+            mask = np.ones(len(self), dtype=bool)
+            for column, value in thresholds:
+                mask &= self.__column(column) >= value
+            selected = np.flatnonzero(mask)
+        return self.take(selected)
+
+    def __column(self, column):
+        values = getattr(self, column)
+        return np.frombuffer(values, dtype=values.typecode) if len(values) else np.empty(0)
+
+    def __arrays(self):
+        return [self.starts, self.splits, self.ends] + [getattr(self, c) for c in self.METRICS]
+
+    def take(self, selected):
+        # new rule set of the selected rules, sharing the item buffer
+        res = RuleSet(self.items)
+        if np is not None and not isinstance(selected, np.ndarray):
+            selected = np.array(selected, dtype=np.intp)
+        for source, target in zip(self.__arrays(), res.__arrays()):
+            if np is None or not len(selected):
+                target.extend(source[j] for j in selected)
+            else:
+                taken = np.frombuffer(source, dtype=source.typecode)[selected]
+                target.fromstring(taken.tostring())
+        return res
+
+    def __permute(self, order):
+        taken = self.take(order)
+        for source, target in zip(taken.__arrays(), self.__arrays()):
+            target[:] = source
+
+"""compute the confidence, lift, leverage and conviction values of rules 
+from their support values, in one batched NumPy pass over all the rules 
+(in pure python if NumPy is not installed)
+- lift: conf(LHS, RHS) / supp(RHS), above 1 if LHS makes RHS more likely
+- leverage: supp(LHS U RHS) - supp(LHS) * supp(RHS), above 0 likewise
+- conviction: (1 - supp(RHS)) / (1 - conf(LHS, RHS)), infinite for exact 
+  rules; it is the ratio of the expected and observed frequencies of LHS 
+  without RHS, so a high support RHS does not inflate it as it inflates 
+  confidence
+
+Parameters
+----------
+supp : list[float]
+    support values of the rules, i.e. of LHS U RHS
+lhs_supp : list[float]
+    support values of the LHS of the rules, none of them 0
+rhs_supp : list[float]
+    support values of the RHS of the rules
+min_conf : float
+    minimum confidence value that the rules must have
+min_lift, min_leverage, min_conviction : float, optional
+    minimum values of the other metrics that the selected rules must have
+max_rhs_supp : float, optional
+    maximum support value of the RHS of the selected rules
+
+Returns
+-------
+conf, lift, leverage, conviction : list[float]
+    metric values of each rule
+confident : list[boolean]
+    whether each rule reaches min_conf
+selected : list[boolean]
+    whether each rule reaches min_conf and all the other thresholds
+"""
+def rule_metrics(supp, lhs_supp, rhs_supp, min_conf, min_lift=None, min_leverage=None, 
+                 min_conviction=None, max_rhs_supp=None):
+    if np is None:
+        conf = [float(s) / l for s, l in zip(supp, lhs_supp)]
+        lift = [c / r if r else float('inf') for c, r in zip(conf, rhs_supp)]
+        leverage = [s - l * r for s, l, r in zip(supp, lhs_supp, rhs_supp)]
+        conviction = [(1 - r) / (1 - c) if c < 1 else float('inf') 
+                      for c, r in zip(conf, rhs_supp)]
+        confident = [c >= min_conf for c in conf]
+        selected = list(confident)
+        for values, threshold in ((lift, min_lift), (leverage, min_leverage), 
+                                  (conviction, min_conviction)):
+            if threshold is not None:
+                selected = [b and v >= threshold for b, v in zip(selected, values)]
+        if max_rhs_supp is not None:
+            selected = [b and r <= max_rhs_supp for b, r in zip(selected, rhs_supp)]
+        return conf, lift, leverage, conviction, confident, selected
+
+    supp = np.asarray(supp, dtype=np.float64)
+    lhs_supp = np.asarray(lhs_supp, dtype=np.float64)
+    rhs_supp = np.asarray(rhs_supp, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        conf = supp / lhs_supp
+        lift = np.where(rhs_supp > 0, conf / rhs_supp, np.inf)
+        conviction = np.where(conf < 1, (1 - rhs_supp) / (1 - conf), np.inf)
+    leverage = supp - lhs_supp * rhs_supp
+    confident = conf >= min_conf
+    selected = confident.copy()
+    for values, threshold in ((lift, min_lift), (leverage, min_leverage), 
+                              (conviction, min_conviction)):
+        if threshold is not None:
+            selected &= values >= threshold
+    if max_rhs_supp is not None:
+        selected &= rhs_supp <= max_rhs_supp
+    return (conf.tolist(), lift.tolist(), leverage.tolist(), conviction.tolist(), 
+            confident.tolist(), selected.tolist())
+
+"""generate rules out of itemsets, level by level of the number of items in RHS
+Reference: 3.1 of Rakesh's paper - the "ap-genrules" function
+The rules with a single item in RHS are tried first; the RHS of the rules 
+found then grow one item at a time, the (m+1)-item RHS being generated by 
+apriori-gen from the m-item RHS of the rules found: if the rule with RHS H 
+does not reach min_conf, no rule whose RHS is a superset of H does, since 
+its LHS is a subset of the LHS of H and has a higher support. The rules of 
+one level are scored together by rule_metrics().
 
 Parameters
 ----------
@@ -50,18 +285,22 @@ itemsets : dict{tuple(int):float}
     key-value pairs of itemsets and their support value
 min_conf : float
     minimum confidence value that the generated rules must have
-numerator : float
-    the numerator in computing the confidence of the input itemset, i.e. 
-    the support value of itemset in itemsets
-itemset : tuple(int)
-    the itemset where rules are generated from
+candidates : list[tuple(tuple(int), float)]
+    the itemsets where rules are generated from, with their support value
+rhs_items : set(int), optional
+    only generate the rules whose RHS items are all among these items
+max_rhs : int, optional
+    maximum number of items in RHS, 1 by default
+min_lift, min_leverage, min_conviction : float, optional
+    minimum values of the other metrics that the generated rules must have
 
 Returns
 -------
-list[AssociationRule]
-    list of association rules generated
+RuleSet
+    association rules generated
 """
-def generate_rules(itemsets, min_conf, numerator, itemset):
+def generate_rule_levels(itemsets, min_conf, candidates, rhs_items=None, max_rhs=1, 
+                         min_lift=None, min_leverage=None, min_conviction=None):
     # calculate the confidence of LHS => RHS, using support values stored  
     # in itemsets:
     # conf(LHS, RHS) = supp(LHS U RHS) / supp(LHS)
@@ -70,26 +309,72 @@ def generate_rules(itemsets, min_conf, numerator, itemset):
     # must exist in itemsets because of the nature of large itemsets: 
     # if (a U b) is a frequent (large) itemset, then (a) must also be a 
     # large itemset
-    res = []
-    for i in xrange(len(itemset)):
-        rhs = [itemset[i]]
+    res = RuleSet()
+    # the rules of one level, as (itemset, numerator, LHS, RHS)
+    level = [(itemset, numerator, itemset[:i] + itemset[i+1:], itemset[i:i+1]) 
+             for itemset, numerator in candidates for i in xrange(len(itemset)) 
+             if rhs_items is None or itemset[i] in rhs_items]
+    m = 1
+    while level:
+        found, lhs_supp = [], []
+        for rule in level:
+            denominator = itemsets.get(rule[2], 0)
+            if denominator:
+                found.append(rule)
+                lhs_supp.append(denominator)
+        supp = [rule[1] for rule in found]
+        rhs_supp = [itemsets.get(rule[3], 0) for rule in found]
         # perhaps we should discard the rule if the support of RHS is too 
         # high, e.g. if the RHS item has support value 0.9, any rule that 
         # leads to the item will likely to have a very high confidence, 
-        # and it somehow makes the rule useless
-        p = itemsets.get(tuple(rhs), 0)
-        if p > min_conf:
-            continue
-
-        lhs = itemset[:i] + itemset[i+1:]
-        denominator = itemsets.get(tuple(lhs), 0)
-        if lhs and rhs and denominator:
-            conf = float(numerator / denominator)
-            if conf >= min_conf:
-                res.append(AssociationRule(lhs, rhs, conf, numerator))
+        # and it somehow makes the rule useless; such single items still 
+        # grow into larger RHS
+        conf, lift, leverage, conviction, confident, selected = rule_metrics(
+            supp, lhs_supp, rhs_supp, min_conf, min_lift, min_leverage, min_conviction, 
+            min_conf if m == 1 else None)
+        chosen = list(compress(found, selected))
+        res.extend([rule[2] for rule in chosen], [rule[3] for rule in chosen], 
+                   *(compress(values, selected) for values in (conf, supp, lift, leverage, conviction)))
+        # the RHS of the rules reaching min_conf, grouped by itemset
+        consequents = []
+        if m < max_rhs:
+            for itemset, numerator, lhs, rhs in compress(found, confident):
+                if m + 1 < len(itemset):
+                    if not consequents or consequents[-1][0] != itemset:
+                        consequents.append((itemset, numerator, []))
+                    consequents[-1][2].append(rhs)
+        level = [(itemset, numerator, tuple(item for item in itemset if item not in rhs), rhs) 
+                 for itemset, numerator, kept in consequents for rhs in apriori_gen(kept)]
+        m += 1
     return res
 
-"""generate all association rules (support only single item in RHS)
+"""generate rules out of one itemset, see generate_rule_levels()
+
+Parameters
+----------
+itemsets : dict{tuple(int):float}
+    key-value pairs of itemsets and their support value
+min_conf : float
+    minimum confidence value that the generated rules must have
+numerator : float
+    the numerator in computing the confidence of the input itemset, i.e. 
+    the support value of itemset in itemsets
+itemset : tuple(int)
+    the itemset where rules are generated from
+rhs_items : set(int), optional
+    only generate the rules whose RHS items are all among these items
+max_rhs : int, optional
+    maximum number of items in RHS, 1 by default
+
+Returns
+-------
+RuleSet
+    association rules generated
+"""
+def generate_rules(itemsets, min_conf, numerator, itemset, rhs_items=None, max_rhs=1):
+    return generate_rule_levels(itemsets, min_conf, [(itemset, numerator)], rhs_items, max_rhs)
+
+"""generate all association rules, with up to max_rhs items in RHS
 
 Parameters
 ----------
@@ -97,20 +382,43 @@ itemsets : dict{tuple(int):float}
     key-value pairs of itemsets and their support value
 min_conf : float
     minimum confidence value that the generated rules must have
+closed : boolean, optional
+    True if itemsets only holds the closed itemsets (see itemsets_closed()), 
+    whose subsets and their exact supports are then derived first
+rhs_items : set(int), optional
+    only generate the rules whose RHS items are all among these items
+supports : dict{tuple(int):float}, optional
+    support values of the LHS (and RHS) of the rules missing from itemsets, 
+    e.g. when itemsets only holds the itemsets with required items, see 
+    lhs_supports()
+max_rhs : int, optional
+    maximum number of items in RHS, 1 by default
+min_lift, min_leverage, min_conviction : float, optional
+    minimum values of the other metrics that the generated rules must have, 
+    see rule_metrics()
 
 Returns
 -------
-list[AssociationRule]
-    list of association rules generated, sorted in the order:
+RuleSet
+    association rules generated, sorted in the order:
     - rules with smaller number of items are favored
     - higher confidence value
     - higher support value
 """
-def association_rules(itemsets, min_conf):
+def association_rules(itemsets, min_conf, closed=False, rhs_items=None, supports=None, 
+                      max_rhs=1, min_lift=None, min_leverage=None, min_conviction=None):
     min_conf = float(min_conf)
-    rules = []
-    for itemset, numerator in itemsets.items():
-        if len(itemset) <= 1: continue
-        rules.extend(generate_rules(itemsets, min_conf, numerator, itemset))
+    if closed:
+        itemsets = expand_closed(itemsets)
+    lookup = itemsets
+    if supports:
+        lookup = dict(itemsets.items())
+        lookup.update(supports)
+    # iterate in order of itemsets, so that rules of equal order are listed 
+    # in the same order regardless of how itemsets was built
+    candidates = [(itemset, numerator) for itemset, numerator in sorted(itemsets.items()) 
+                  if len(itemset) > 1]
+    rules = generate_rule_levels(lookup, min_conf, candidates, rhs_items, max_rhs, 
+                                 min_lift, min_leverage, min_conviction)
     rules.sort()
     return rules
@@ -0,0 +1,111 @@
+import math
+import random
+from collections import defaultdict
+from apriori import itemsets_apriori, apriori_gen, large_test
+from itemstore import ItemsetTrie
+
+# probability that the lowered support value misses a large itemset, used
+# for the default lowered support value of the sample
+SAMPLING_DELTA = 0.01
+
+"""compute the negative border of a downward closed collection of itemsets
+The negative border holds the minimal itemsets not in the collection, i.e.
+the candidates of apriori_gen() which are not in the collection
+themselves. Single items are left out, since any item is in the border
+unless it is in the collection.
+
+Parameters
+----------
+itemsets : collection of tuple(int)
+    downward closed itemsets, e.g. the large itemsets of a sample
+
+Returns
+-------
+list[tuple(int)]
+    itemsets of the negative border of at least 2 items
+"""
+def negative_border(itemsets):
+    itemsets = set(itemsets)
+    return [candidate for candidate in apriori_gen(itemsets) if candidate not in itemsets]
+
+"""generate large(frequent) itemsets by sampling
+Reference: Sampling Large Databases for Association Rules by Toivonen
+The large itemsets of a random sample of data are mined with a lowered
+support value, then those itemsets and their negative border are counted
+in one pass over data. If no itemset of the border is large in data, the
+large itemsets counted are exactly the large itemsets of data. Otherwise,
+some large itemsets may have been missed: the border itemsets found large
+are the misses, and the whole data is mined again unless fallback is False.
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+min_supp: float
+    minimum support value for an itemset to be "large"
+sample_size : int
+    number of transactions in the sample
+low_supp : float, optional
+    support value mining the sample, by default min_supp lowered by
+    sqrt(ln(1 / SAMPLING_DELTA) / (2 * sample_size)) (but at most halved)
+seed : int, optional
+    seed of the random sample
+counting : str, optional
+    name of the counting backend of the Apriori algorithm, 'scan' by default
+fallback : boolean, optional
+    mine the whole data if any itemset is missed, True by default
+misses : list, optional
+    if given, the border itemsets found large in data are appended to it
+
+Returns
+-------
+itemsets : dict{tuple(int):float}
+    key-value pairs of large itemsets (tuple of integers) and their support
+    value in the data, same as itemsets_apriori() unless there were misses
+    and fallback is False
+"""
+def itemsets_sampling(data, min_supp, sample_size, low_supp=None, seed=None,
+                      counting='scan', fallback=True, misses=None):
+    total = len(data)
+    if sample_size <= 0:
+        raise ValueError("[ERROR] Invalid sample size: {}".format(sample_size))
+    if not total:
+        return {}
+    sample = random.Random(seed).sample(data, min(sample_size, total))
+    if low_supp is None:
+        low_supp = max(min_supp - math.sqrt(math.log(1 / SAMPLING_DELTA) / (2 * len(sample))),
+                       min_supp / 2)
+    if __debug__:
+        print "Mining a sample of {} transactions with support {}".format(len(sample), low_supp)
+    candidates = itemsets_apriori(sample, low_supp, counting).keys()
+    border = negative_border(candidates)
+    if __debug__:
+        print "Sample itemsets: {}, negative border: {}".format(len(candidates), len(border))
+
+    # one pass over data counts all items, the sample itemsets and the border
+    trie = ItemsetTrie(total)
+    for itemset in candidates + border:
+        trie.add(itemset, 0)
+    singles = defaultdict(int)
+    for trans in data:
+        for item in trans:
+            singles[item] += 1
+        trie.increment_subsets(sorted(trans))
+
+    itemsets = dict((itemset, supp) for itemset, supp in trie.items() if supp >= min_supp)
+    missed = [itemset for itemset in border if itemset in itemsets]
+    is_large = large_test(total, min_supp)
+    missed.extend((item,) for item, count in singles.items()
+                  if (item,) not in itemsets and is_large(count))
+    if __debug__:
+        print "Large itemsets verified: {}, missed: {}".format(len(itemsets), len(missed))
+    if misses is not None:
+        misses.extend(missed)
+    if missed:
+        if fallback:
+            return itemsets_apriori(data, min_supp, counting)
+        # the counts of missed single items are known as well
+        for itemset in missed:
+            if len(itemset) == 1:
+                itemsets[itemset] = float(singles[itemset[0]]) / total
+    return itemsets
@@ -0,0 +1,218 @@
+import os
+import csv
+import sys
+import argparse
+from cStringIO import StringIO
+from bisect import insort
+from operator import itemgetter
+from itertools import combinations
+from data import CSVData
+from rules import RuleSet
+from ruleindex import load_index
+
+# number of distinct rows whose consequents are kept by score_csv(), rows
+# repeating often (e.g. inspections of the same kind) are only matched once
+SCORE_CACHE_SIZE = 1 << 16
+
+class RuleScorer(object):
+    """
+    Consequents of association rules applying to transactions. The rules
+    are stored in a prefix trie of their LHS, which are sorted lists of
+    integer items, each node holding the rules whose LHS ends there, best
+    score first; the LHS contained in a transaction are found in one walk
+    of the trie along the sorted items of the transaction, without testing
+    each rule. The consequents of a transaction are the RHS of the rules
+    found, best score first, except the RHS with an item the transaction
+    already has. The nodes are scanned best rule first, each one up to its
+    first rule scoring below the top_n consequents found so far. A rule is
+    not stored if a rule with the same RHS and a smaller LHS scores as high,
+    since that rule applies wherever it does.
+
+    ...
+
+    Attributes
+    ----------
+    rules : RuleSet
+        rules applied
+    by : str
+        metric scoring the consequents, see RuleSet.METRICS
+    top_n : int
+        maximum number of consequents of a transaction
+
+    Methods
+    -------
+    score(items)
+        best consequents (tuple(int), float) of a sorted list of integer items
+    """
+    def __init__(self, rules, by='conf', top_n=3):
+        if by not in RuleSet.METRICS:
+            raise ValueError("[ERROR] Invalid rule metric: {}".format(by))
+        if top_n <= 0:
+            raise ValueError("[ERROR] Invalid number of consequents: {}".format(top_n))
+        self.rules = rules
+        self.by = by
+        self.top_n = top_n
+        scores = getattr(rules, by)
+        self.__root = [None, {}]
+        # LHS and RHS of each rule and their score
+        scored = {}
+        for j in xrange(len(rules)):
+            start, split, end = rules.starts[j], rules.splits[j], rules.ends[j]
+            scored[tuple(rules.items[start:split]), tuple(rules.items[split:end])] = scores[j]
+        for j in xrange(len(rules)):
+            start, split, end = rules.starts[j], rules.splits[j], rules.ends[j]
+            lhs, rhs = tuple(rules.items[start:split]), tuple(rules.items[split:end])
+            if any(scored.get((subset, rhs), float('-inf')) >= scores[j] 
+                   for n in xrange(1, len(lhs)) for subset in combinations(lhs, n)):
+                continue
+            node = self.__root
+            for item in lhs:
+                children = node[1]
+                if children is None:
+                    children = node[1] = {}
+                child = children.get(item)
+                if child is None:
+                    child = children[item] = [None, None]
+                node = child
+            if node[0] is None:
+                node[0] = []
+            # sorted on -score, best score first and ties in the order of the rules
+            node[0].append((-scores[j], j, rhs))
+        stack = [self.__root]
+        while stack:
+            node = stack.pop()
+            if node[0] is not None:
+                node[0].sort()
+            if node[1]:
+                stack.extend(node[1].values())
+
+    def score(self, items):
+        # lists of the rules of the LHS contained in items, found as the
+        # itemsets of ItemsetTrie.increment_subsets()
+        found = []
+        stack = [(self.__root, 0)]
+        while stack:
+            node, start = stack.pop()
+            children = node[1]
+            if not children:
+                continue
+            for i in xrange(start, len(items)):
+                child = children.get(items[i])
+                if child is not None:
+                    if child[0] is not None:
+                        found.append(child[0])
+                    stack.append((child, i + 1))
+        # best rules of distinct RHS so far; the lists are scanned best rule 
+        # first, and left as soon as their rules cannot rank any more
+        top = []
+        top_n = self.top_n
+        present = set(items)
+        found.sort(key=itemgetter(0))
+        for rules in found:
+            for rule in rules:
+                if len(top) == top_n and rule >= top[-1]:
+                    break
+                rhs = rule[2]
+                if not present.isdisjoint(rhs):
+                    continue
+                for k, other in enumerate(top):
+                    if other[2] == rhs:
+                        if rule < other:
+                            top[k] = rule
+                            top.sort()
+                        break
+                else:
+                    insort(top, rule)
+                    del top[top_n:]
+        return [(rhs, -score) for score, j, rhs in top]
+
+"""score the rows of a CSV file with saved rules, writing the best
+consequents of each row as CSV lines "row,rank,consequent,score", where row
+is the line number of the row in the file and the items of consequent are
+joined with " , "; rows without consequents are not written
+
+Parameters
+----------
+indexname : str
+    name of the rule index file, see main.py --index
+csvname : str
+    name of the CSV file of the rows
+outfile : file
+    file the consequents are written to
+top_n : int, optional
+    maximum number of consequents of a row, 3 by default
+by : str, optional
+    metric scoring the consequents, 'conf' by default
+rhs : list[str], optional
+    patterns of items (e.g. "VIOLATION_*"), only the rules with an item
+    matching each of them in RHS are applied
+min_conf : float, optional
+    minimal confidence value of the rules applied
+min_lift : float, optional
+    minimal lift value of the rules applied
+
+Returns
+-------
+int
+    number of rows scored
+"""
+def score_csv(indexname, csvname, outfile, top_n=3, by='conf', rhs=None, min_conf=None,
+              min_lift=None):
+    if not indexname or not os.path.isfile(indexname):
+        raise ValueError("[ERROR] Invalid rule index file: {}".format(indexname))
+    if not csvname or not os.path.isfile(csvname):
+        raise ValueError("[ERROR] Invalid CSV file: {}".format(csvname))
+    index = load_index(indexname)
+    scorer = RuleScorer(index.query(rhs=rhs, min_conf=min_conf, min_lift=min_lift), by, top_n)
+    csvdata = CSVData(None)
+    csvdata.load_vocabulary(index.id2item)
+    # the lines of a row are formatted once, without the row number, and 
+    # reused for the rows with the same items
+    formatted = {}
+    terminator = csv.excel.lineterminator
+    n = 0
+    for n, items in enumerate(csvdata.encode_rows(csvname), 1):
+        key = tuple(items)
+        lines = formatted.get(key)
+        if lines is None:
+            buf = StringIO()
+            writer = csv.writer(buf)
+            for rank, (consequent, score) in enumerate(scorer.score(items), 1):
+                writer.writerow((rank, " , ".join(csvdata.item_list(consequent)), "%.4f" % score))
+            lines = buf.getvalue().split(terminator)[:-1]
+            if len(formatted) >= SCORE_CACHE_SIZE:
+                formatted.clear()
+            formatted[key] = lines
+        if lines:
+            prefix = "%d," % n
+            outfile.write(prefix + (terminator + prefix).join(lines) + terminator)
+    if __debug__:
+        print >> sys.stderr, "Scored {} rows with {} rules".format(n, len(scorer.rules))
+    return n
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply association rules to the rows of a CSV file')
+    parser.add_argument('index', type=str, help='name of the rule index file (see main.py --index)')
+    parser.add_argument('csvname', type=str, help='name of the CSV file that contains the rows')
+    parser.add_argument('--top-n', type=int, default=3,
+                        help='maximum number of consequents of a row')
+    parser.add_argument('--by', type=str, default='conf', choices=RuleSet.METRICS,
+                        help='metric scoring the consequents')
+    parser.add_argument('--rhs', type=str, action='append',
+                        help='only apply rules whose RHS has an item matching this pattern (repeatable)')
+    parser.add_argument('--min-conf', type=float, default=None,
+                        help='minimal confidence value of the rules applied')
+    parser.add_argument('--min-lift', type=float, default=None,
+                        help='minimal lift value of the rules applied')
+    parser.add_argument('--output', type=str, default=None,
+                        help='write the consequents to this file instead of the standard output')
+
+    args = vars(parser.parse_args())
+    output = args.pop('output')
+    if output is None:
+        score_csv(args.pop('index'), args.pop('csvname'), sys.stdout, **args)
+    else:
+        with open(output, 'wb') as outfile:
+            score_csv(args.pop('index'), args.pop('csvname'), outfile, **args)
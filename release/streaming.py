@@ -0,0 +1,143 @@
+import math
+from apriori import apriori_gen
+
+class ApproximateItemsets(dict):
+    """
+    Large itemsets and their support values, as returned by
+    itemsets_apriori(), except that the support values are approximate:
+    each one is at most epsilon below the exact support value.
+
+    ...
+
+    Attributes
+    ----------
+    approximate : boolean
+        always True, tells the support values are approximate
+    epsilon : float
+        maximum error of the support values
+    total : int
+        number of transactions the support values were computed on
+    """
+    approximate = True
+
+    def __init__(self, epsilon, total):
+        dict.__init__(self)
+        self.epsilon = epsilon
+        self.total = total
+
+class LossyCounter(object):
+    """
+    Approximate counts of the itemsets of a stream of transactions, using
+    Lossy Counting with buckets of ceil(1 / epsilon) transactions.
+    Reference: Approximate Frequency Counts over Data Streams by Manku and
+    Motwani
+    Each itemset kept has a count f, the number of its occurrences since it
+    was kept, and a maximum error delta, the number of buckets before it was
+    kept. Transactions are buffered and counted in batches of several
+    buckets, level by level: a k-itemset is only counted if its (k-1)-subsets
+    are kept, and only kept if it is new and occurs at least once per bucket
+    of the batch. At the end of bucket b, the itemsets with f + delta <= b
+    are dropped, along with their supersets. An itemset dropped or not kept
+    occurred at most b times, so no more than epsilon * total occurrences
+    are ever missed, while the memory only holds the itemsets kept and one
+    batch of transactions.
+
+    ...
+
+    Attributes
+    ----------
+    epsilon : float
+        maximum error of the support values
+    max_len : int
+        maximum number of items of the itemsets counted
+    buckets : int
+        number of buckets of a batch
+    width : int
+        number of transactions of a bucket
+    total : int
+        number of transactions consumed so far
+
+    Methods
+    -------
+    add(trans)
+        consume one transaction (set of int)
+    consume(transactions)
+        consume all the transactions of an iterable
+    itemsets(min_supp)
+        large itemsets of the transactions consumed so far
+    """
+    def __init__(self, epsilon, max_len=3, buckets=8):
+        if not 0 < epsilon < 1:
+            raise ValueError("[ERROR] Invalid support error: {}".format(epsilon))
+        if max_len <= 0:
+            raise ValueError("[ERROR] Invalid maximum itemset length: {}".format(max_len))
+        if buckets <= 0:
+            raise ValueError("[ERROR] Invalid number of buckets per batch: {}".format(buckets))
+        self.epsilon = epsilon
+        self.max_len = max_len
+        self.buckets = buckets
+        self.width = int(math.ceil(1 / epsilon))
+        self.total = 0
+        self.__counts = {}
+        self.__deltas = {}
+        self.__batch = []
+
+    def add(self, trans):
+        self.__batch.append(tuple(sorted(trans)))
+        self.total += 1
+        if len(self.__batch) == self.width * self.buckets:
+            b = self.total // self.width
+            self.__merge(self.__counts, self.__deltas, b, self.buckets)
+            self.__prune(b)
+            self.__batch = []
+
+    def consume(self, transactions):
+        for trans in transactions:
+            self.add(trans)
+
+    def itemsets(self, min_supp):
+        counts, deltas = self.__counts, self.__deltas
+        if self.__batch:
+            # count the partial batch on a copy, it is pruned once complete
+            counts, deltas = dict(counts), dict(deltas)
+            partial = -(-len(self.__batch) // self.width)
+            self.__merge(counts, deltas, (self.total - len(self.__batch)) // self.width + partial, 
+                         partial)
+        itemsets = ApproximateItemsets(self.epsilon, self.total)
+        if not self.total:
+            return itemsets
+        for itemset, count in counts.items():
+            if float(count) / self.total >= min_supp - self.epsilon:
+                itemsets[itemset] = float(count) / self.total
+        return itemsets
+
+    def __merge(self, counts, deltas, b, buckets):
+        # count the batch of the given number of buckets, ending with bucket b
+        # level 1: all the items, level k: joins of the kept (k-1)-itemsets
+        levels = [[(item,) for item in trans] for trans in self.__batch]
+        for k in xrange(1, self.max_len + 1):
+            local = {}
+            for n, level in enumerate(levels):
+                if k > 1:
+                    level = levels[n] = apriori_gen(
+                        [itemset for itemset in level if itemset in counts])
+                for itemset in level:
+                    local[itemset] = local.get(itemset, 0) + 1
+            if not local:
+                break
+            for itemset, count in local.items():
+                if itemset in counts:
+                    counts[itemset] += count
+                elif count >= buckets:
+                    counts[itemset] = count
+                    deltas[itemset] = b - buckets
+
+    def __prune(self, b):
+        counts, deltas = self.__counts, self.__deltas
+        for itemset in sorted(counts, key=len):
+            if counts[itemset] + deltas[itemset] <= b or (len(itemset) > 1 and not all(
+                    itemset[:i] + itemset[i+1:] in counts for i in xrange(len(itemset)))):
+                del counts[itemset]
+                del deltas[itemset]
+        if __debug__:
+            print "Bucket {}: {} itemsets kept".format(b, len(counts))
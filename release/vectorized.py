@@ -0,0 +1,206 @@
+from array import array
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# upper bound of the temporary buffers created when counting a batch of
+# candidates, in bytes
+BLOCK_BYTES = 1 << 26
+
+# number of transactions whose bits are set at once by packed_matrix(), a
+# multiple of 8 so that each block starts on a byte of the matrix
+PACK_ROWS = 1 << 14
+
+# number of bits set in each byte value, used as popcount lookup table
+POPCOUNT = None if np is None else np.array(
+    [bin(i).count('1') for i in xrange(256)], dtype=np.uint8)
+
+"""build a packed boolean item x transaction matrix
+
+Parameters
+----------
+data : list[set(int)]
+    list of transactions, each transaction is a set of integer items
+index : dict{int:int}
+    row of each item in the matrix, items not in index are ignored
+
+Returns
+-------
+numpy.ndarray
+    matrix of uint8, row i holds the bits of all transactions containing
+    the item of row i, packed 8 transactions per byte
+"""
+def packed_matrix(data, index):
+    packed = np.zeros((len(index), (len(data) + 7) // 8), dtype=np.uint8)
+    # the bits are set PACK_ROWS transactions at a time, so that neither an 
+    # unpacked matrix nor the positions of all the bits are ever held
+    for start in xrange(0, len(data), PACK_ROWS):
+        end = min(start + PACK_ROWS, len(data))
+        rows, cols = array('l'), array('l')
+        for tid in xrange(start, end):
+            for item in data[tid]:
+                i = index.get(item)
+                if i is not None:
+                    rows.append(i)
+                    cols.append(tid - start)
+        if not rows:
+            continue
+        rows = np.frombuffer(rows, dtype=np.dtype('l'))
+        cols = np.frombuffer(cols, dtype=np.dtype('l'))
+        width = (end - start + 7) // 8
+        # the bits of a byte are distinct transactions, so their sum is their OR
+        block = np.bincount(rows * width + (cols >> 3), weights=0x80 >> (cols & 7), 
+                            minlength=len(index) * width)
+        packed[:, start // 8:start // 8 + width] = block.reshape(len(index), width)
+    return packed
+
+"""build the packed bit planes of the weights of the transactions
+
+Parameters
+----------
+weights : list[int]
+    number of occurrences of each transaction, or None
+
+Returns
+-------
+numpy.ndarray
+    packed matrix of uint8, row b holds the bits of all transactions whose 
+    weight has bit b set, None if weights is None
+"""
+def packed_planes(weights):
+    if weights is None:
+        return None
+    nbits = max(weights).bit_length() if weights else 0
+    weights = np.array(weights, dtype=np.int64)
+    packed = np.zeros((nbits, (len(weights) + 7) // 8), dtype=np.uint8)
+    for b in xrange(nbits):
+        packed[b] = np.packbits(((weights >> b) & 1).astype(np.uint8))
+    return packed
+
+"""count the transactions containing all items of each candidate
+
+Parameters
+----------
+matrix : numpy.ndarray
+    packed item x transaction matrix, see packed_matrix()
+candidates : numpy.ndarray
+    matrix of int, each row holds the matrix rows of a candidate's items
+planes : numpy.ndarray, optional
+    packed matrix of the bit planes of the weights of the transactions, row 
+    b holding the transactions whose weight has bit b set, see 
+    packed_planes(); each transaction counts once if not given
+
+Returns
+-------
+numpy.ndarray
+    number of occurrences of each candidate
+"""
+def count_packed(matrix, candidates, planes=None):
+    counts = np.zeros(len(candidates), dtype=np.int64)
+    # bound the size of the intermediate AND results
+    step = max(1, BLOCK_BYTES // max(1, matrix.shape[1]))
+    for start in xrange(0, len(candidates), step):
+        block = candidates[start:start + step]
+        bits = matrix[block[:, 0]]
+        for j in xrange(1, block.shape[1]):
+            bits &= matrix[block[:, j]]
+        if planes is None:
+            counts[start:start + step] = POPCOUNT[bits].sum(axis=1, dtype=np.int64)
+            continue
+        for b in xrange(len(planes)):
+            counts[start:start + step] += POPCOUNT[bits & planes[b]].sum(
+                axis=1, dtype=np.int64) << b
+    return counts
+
+class NumpyCounter(object):
+    """
+    Counting backend using NumPy. Transactions are turned into a packed
+    boolean item x transaction matrix (one bit per transaction), and all
+    candidates of a level are counted in batches by AND-ing the rows of
+    their items and popcounting the result.
+
+    The matrix only holds the items of the first level counted (i.e. the
+    large 1-itemsets). If chunk_rows is given, the matrix is never built
+    as a whole; instead, each level builds and counts the matrix of
+    chunk_rows transactions at a time, which bounds peak memory at the
+    cost of a scan of data per level. Setting data and weights to trimmed 
+    copies (see trim_transactions()) with fewer transactions drops the 
+    whole matrix, which the next level builds again with fewer columns; 
+    it is kept while only items are removed, since the items trimmed are 
+    in no candidate any more. Weighted 
+    transactions are counted with the bit planes of their weights, see 
+    packed_planes().
+
+    ...
+
+    Methods
+    -------
+    count(candidates)
+        number of occurrences of each candidate itemset
+    update(kplus)
+        notify the backend of the large itemsets found in the current level
+    """
+    def __init__(self, data, chunk_rows=None, weights=None):
+        if np is None:
+            raise ImportError("[ERROR] NumPy is required by the numpy counting backend")
+        if chunk_rows is not None and chunk_rows <= 0:
+            raise ValueError("[ERROR] Invalid number of rows per chunk: {}".format(chunk_rows))
+        self.chunk_rows = chunk_rows
+        self.__index = None
+        self.__matrix = self.__planes = None
+        self.__data = self.__weights = None
+        self.data = data
+        self.weights = weights
+
+    @property
+    def data(self):
+        return self.__data
+
+    @data.setter
+    def data(self, data):
+        if self.__data is None or len(data) != len(self.__data):
+            self.__matrix = self.__planes = None
+        self.__data = data
+
+    @property
+    def weights(self):
+        return self.__weights
+
+    @weights.setter
+    def weights(self, weights):
+        if (weights is None) != (self.__weights is None) or (
+                weights is not None and len(weights) != len(self.__weights)):
+            self.__matrix = self.__planes = None
+        self.__weights = weights
+
+    def __chunks(self):
+        # the matrix and bit planes of each chunk of data
+        if self.__matrix is not None:
+            yield self.__matrix, self.__planes
+            return
+        if not self.chunk_rows:
+            self.__matrix = packed_matrix(self.data, self.__index)
+            self.__planes = packed_planes(self.weights)
+            yield self.__matrix, self.__planes
+            return
+        for start in xrange(0, len(self.data), self.chunk_rows):
+            end = start + self.chunk_rows
+            yield (packed_matrix(self.data[start:end], self.__index), 
+                   packed_planes(None if self.weights is None else self.weights[start:end]))
+
+    def count(self, candidates):
+        if not candidates:
+            return []
+        if self.__index is None:
+            items = sorted(set(item for c in candidates for item in c))
+            self.__index = dict((item, i) for i, item in enumerate(items))
+        index = self.__index
+        rows = np.array([[index[item] for item in c] for c in candidates], dtype=np.intp)
+        counts = np.zeros(len(candidates), dtype=np.int64)
+        for matrix, planes in self.__chunks():
+            counts += count_packed(matrix, rows, planes)
+        return counts.tolist()
+
+    def update(self, kplus):
+        pass